@@ -7,12 +7,15 @@ import json
 import os
 import logging
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from datetime import datetime
 from platform_utils import platform_utils
 
 logger = logging.getLogger(__name__)
 
+# 本进程内配置成功保存的次数，供缓存了配置派生对象（如LLM客户端）的模块判断是否需要重建
+_config_version = 0
+
 class ConfigManager:
     """配置管理器"""
     
@@ -165,6 +168,9 @@ class ConfigManager:
             if config:
                 self._config = config
 
+            global _config_version
+            _config_version += 1
+
             logger.info(f"配置已保存到: {self.config_file}")
             return True
         except Exception as e:
@@ -616,5 +622,13 @@ class ConfigManager:
             return config.get("verified", False)
         return False
 
+def get_config_version() -> Tuple[int, int]:
+    """获取配置版本：(本进程内保存次数, 配置文件修改时间)，其他进程修改配置文件时同样会变化"""
+    try:
+        mtime_ns = platform_utils.get_config_file_path().stat().st_mtime_ns
+    except OSError:
+        mtime_ns = 0
+    return _config_version, mtime_ns
+
 # 全局配置管理器实例
 config_manager = ConfigManager()
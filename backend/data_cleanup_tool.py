@@ -4,16 +4,20 @@
 """
 
 import os
+import time
 import sqlite3
 import logging
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Set, Any
+from typing import Dict, List, Set, Any, Optional, Tuple
 import chromadb
 from chromadb.errors import NotFoundError
 
 logger = logging.getLogger(__name__)
 
+# 扫描结果缓存的最长有效期（秒），即使mtime未变化也会在超时后重新扫描
+SCAN_CACHE_TTL_SECONDS = 30.0
+
 class DataCleanupTool:
     """数据清理工具"""
     
@@ -21,9 +25,38 @@ class DataCleanupTool:
         self.chroma_path = chroma_path
         self.client = client
         self.db_path = chroma_path / "chroma.sqlite3"
+        # (指纹, 扫描时间, 分析结果)
+        self._last_scan: Optional[Tuple[Tuple[int, ...], float, Dict[str, Any]]] = None
+    
+    def _scan_fingerprint(self) -> Tuple[int, ...]:
+        """基于数据库文件和数据目录的mtime生成扫描指纹"""
+        fingerprint = []
+        for path in (self.db_path, self.db_path.with_name(self.db_path.name + "-wal"), self.chroma_path):
+            try:
+                fingerprint.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                fingerprint.append(0)
+        return tuple(fingerprint)
+    
+    def invalidate_scan_cache(self):
+        """清除缓存的扫描结果"""
+        self._last_scan = None
     
-    def scan_for_orphaned_data(self) -> Dict[str, Any]:
-        """扫描孤立数据"""
+    def scan_for_orphaned_data(self, force: bool = False, verbose: bool = False) -> Dict[str, Any]:
+        """扫描孤立数据
+        
+        Args:
+            force: 为True时忽略缓存，强制重新扫描
+            verbose: 为True时在结果的debug字段中附带完整的集合/目录/记录列表
+        """
+        fingerprint = self._scan_fingerprint()
+        if not force and not verbose and self._last_scan is not None:
+            cached_fingerprint, scanned_at, cached_analysis = self._last_scan
+            if (cached_fingerprint == fingerprint and
+                    time.monotonic() - scanned_at < SCAN_CACHE_TTL_SECONDS):
+                logger.debug("数据未变化，复用上次的孤立数据扫描结果")
+                return cached_analysis
+        
         logger.info("开始扫描孤立数据...")
         
         # 获取ChromaDB中的集合
@@ -39,11 +72,14 @@ class DataCleanupTool:
         analysis = self._analyze_differences(
             chromadb_collections, 
             filesystem_dirs, 
-            database_records
+            database_records,
+            verbose=verbose
         )
         
         logger.info(f"扫描完成，发现 {len(analysis['orphaned_dirs'])} 个孤立目录")
         
+        if not verbose:
+            self._last_scan = (fingerprint, time.monotonic(), analysis)
         return analysis
     
     def _get_chromadb_collections(self) -> Set[str]:
@@ -89,19 +125,27 @@ class DataCleanupTool:
     
     def _analyze_differences(self, chromadb_collections: Set[str], 
                            filesystem_dirs: Set[str], 
-                           database_records: Set[str]) -> Dict[str, Any]:
-        """分析数据差异"""
+                           database_records: Set[str],
+                           verbose: bool = False) -> Dict[str, Any]:
+        """分析数据差异
         
-        # 孤立的文件系统目录（存在于文件系统但不在ChromaDB中）
-        orphaned_dirs = filesystem_dirs - chromadb_collections
+        完整的集合/目录/记录列表只在verbose时返回，默认仅返回数量
+        """
         
-        # 孤立的数据库记录（存在于数据库但不在ChromaDB中）
-        orphaned_db_records = database_records - chromadb_collections
-        
-        # 缺失的文件系统目录（存在于ChromaDB但文件系统中没有）
-        missing_dirs = chromadb_collections - filesystem_dirs
+        # 三方一致时（最常见的情况）无需计算差集和目录大小
+        if filesystem_dirs == chromadb_collections and database_records == chromadb_collections:
+            orphaned_dirs = orphaned_db_records = missing_dirs = set()
+        else:
+            # 孤立的文件系统目录（存在于文件系统但不在ChromaDB中）
+            orphaned_dirs = filesystem_dirs - chromadb_collections
+            
+            # 孤立的数据库记录（存在于数据库但不在ChromaDB中）
+            orphaned_db_records = database_records - chromadb_collections
+            
+            # 缺失的文件系统目录（存在于ChromaDB但文件系统中没有）
+            missing_dirs = chromadb_collections - filesystem_dirs
         
-        # 计算大小
+        # 计算大小（仅在存在孤立目录时遍历）
         orphaned_sizes = {}
         total_orphaned_size = 0
         
@@ -115,10 +159,10 @@ class DataCleanupTool:
                 logger.warning(f"计算目录大小失败 {dir_name}: {e}")
                 orphaned_sizes[dir_name] = 0
         
-        return {
-            "chromadb_collections": list(chromadb_collections),
-            "filesystem_dirs": list(filesystem_dirs),
-            "database_records": list(database_records),
+        analysis = {
+            "chromadb_collections_count": len(chromadb_collections),
+            "filesystem_dirs_count": len(filesystem_dirs),
+            "database_records_count": len(database_records),
             "orphaned_dirs": list(orphaned_dirs),
             "orphaned_db_records": list(orphaned_db_records),
             "missing_dirs": list(missing_dirs),
@@ -132,6 +176,15 @@ class DataCleanupTool:
                 "cleanup_needed": len(orphaned_dirs) > 0 or len(orphaned_db_records) > 0
             }
         }
+        
+        if verbose:
+            analysis["debug"] = {
+                "chromadb_collections": list(chromadb_collections),
+                "filesystem_dirs": list(filesystem_dirs),
+                "database_records": list(database_records)
+            }
+        
+        return analysis
     
     def cleanup_orphaned_data(self, dry_run: bool = True) -> Dict[str, Any]:
         """清理孤立数据"""
@@ -166,6 +219,7 @@ class DataCleanupTool:
                 else:
                     import shutil
                     shutil.rmtree(dir_path)
+                    self.invalidate_scan_cache()
                     cleaned_items.append({
                         "type": "filesystem_dir",
                         "name": dir_name,
@@ -197,6 +251,7 @@ class DataCleanupTool:
                             cursor.execute("DELETE FROM segments WHERE collection = ?", (record_id,))
                         
                         conn.commit()
+                    self.invalidate_scan_cache()
                 
                 for record_id in analysis['orphaned_db_records']:
                     cleaned_items.append({
@@ -273,6 +328,13 @@ class DataCleanupTool:
         
         return report
 
+# 全局实例，使扫描缓存可以在多次请求之间复用
+_cleanup_tool = None
+
 def get_data_cleanup_tool(chroma_path: Path, client: chromadb.PersistentClient) -> DataCleanupTool:
     """获取数据清理工具实例"""
-    return DataCleanupTool(chroma_path, client)
+    global _cleanup_tool
+    if (_cleanup_tool is None or _cleanup_tool.client is not client
+            or Path(_cleanup_tool.chroma_path) != Path(chroma_path)):
+        _cleanup_tool = DataCleanupTool(chroma_path, client)
+    return _cleanup_tool
@@ -17,6 +17,17 @@ from chromadb.config import Settings
 
 logger = logging.getLogger(__name__)
 
+# 有效向量数据目录必须包含的文件
+REQUIRED_FILES = frozenset({"header.bin", "data_level0.bin", "length.bin", "link_lists.bin"})
+
+# 元数据值类型 -> (collection_metadata中值列的偏移: str/int/float/bool, 转换函数)
+METADATA_VALUE_COLUMNS = {
+    str: (0, str),
+    int: (1, int),
+    float: (2, float),
+    bool: (3, int),
+}
+
 class DataRecoveryTool:
     """数据恢复工具"""
     
@@ -24,14 +35,47 @@ class DataRecoveryTool:
         self.chroma_path = Path(chroma_path)
         self.db_path = self.chroma_path / "chroma.sqlite3"
         self.recovery_log_path = self.chroma_path / "recovery.log"
+        self._client: Optional[chromadb.PersistentClient] = None
+        self._log_fd: Optional[int] = None
+    
+    def close(self):
+        """关闭恢复日志文件描述符"""
+        if getattr(self, "_log_fd", None) is not None:
+            try:
+                os.close(self._log_fd)
+            except OSError:
+                pass
+            self._log_fd = None
+    
+    def __del__(self):
+        self.close()
+    
+    def _get_client(self) -> chromadb.PersistentClient:
+        """获取共享的ChromaDB客户端（延迟创建）"""
+        if self._client is None:
+            self._client = chromadb.PersistentClient(path=str(self.chroma_path))
+        return self._client
+    
+    def _collection_exists(self, collection_id: str) -> bool:
+        """直接查询数据库判断集合是否已注册"""
+        if not self.db_path.exists():
+            return False
+        with sqlite3.connect(str(self.db_path)) as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT 1 FROM collections WHERE id = ? OR name = ? LIMIT 1",
+                (collection_id, collection_id)
+            )
+            return cursor.fetchone() is not None
     
     def scan_orphaned_collections(self) -> List[Dict[str, Any]]:
         """扫描孤立的集合数据"""
         orphaned_collections = []
         
         # 获取所有向量文件夹
-        vector_dirs = [d for d in self.chroma_path.iterdir() 
-                      if d.is_dir() and self._is_vector_directory(d)]
+        with os.scandir(self.chroma_path) as it:
+            vector_dirs = [Path(entry.path) for entry in it
+                           if entry.is_dir() and self._is_vector_directory(Path(entry.path))]
         
         # 获取数据库中已注册的集合ID
         registered_ids = set()
@@ -56,17 +100,25 @@ class DataRecoveryTool:
     
     def _is_vector_directory(self, path: Path) -> bool:
         """判断是否为有效的向量数据目录"""
-        required_files = ["header.bin", "data_level0.bin", "length.bin", "link_lists.bin"]
-        return all((path / file).exists() for file in required_files)
+        try:
+            with os.scandir(path) as it:
+                names = {entry.name for entry in it}
+        except OSError:
+            return False
+        return REQUIRED_FILES.issubset(names)
     
     def _analyze_vector_directory(self, vector_dir: Path) -> Optional[Dict[str, Any]]:
         """分析向量目录，提取集合信息"""
         try:
+            # 一次scandir获取所有条目，后续判断和大小读取都复用DirEntry，避免重复stat
+            with os.scandir(vector_dir) as it:
+                entries = {entry.name: entry for entry in it}
+            
             collection_info = {
                 "collection_id": vector_dir.name,
                 "vector_path": str(vector_dir),
-                "estimated_size_mb": self._calculate_directory_size(vector_dir),
-                "files": list(vector_dir.iterdir()),
+                "estimated_size_mb": self._calculate_directory_size(vector_dir, entries),
+                "files": list(entries),
                 "metadata": {},
                 "estimated_document_count": 0,
                 "dimension": None,
@@ -74,10 +126,9 @@ class DataRecoveryTool:
             }
             
             # 尝试从index_metadata.pickle读取元数据
-            metadata_file = vector_dir / "index_metadata.pickle"
-            if metadata_file.exists():
+            if "index_metadata.pickle" in entries:
                 try:
-                    with open(metadata_file, 'rb') as f:
+                    with open(entries["index_metadata.pickle"].path, 'rb') as f:
                         index_metadata = pickle.load(f)
                     collection_info["metadata"]["index_metadata"] = str(index_metadata)
                     collection_info["recoverable"] = True
@@ -85,20 +136,19 @@ class DataRecoveryTool:
                     logger.warning(f"读取索引元数据失败 {vector_dir.name}: {e}")
             
             # 分析header.bin获取基本信息
-            header_file = vector_dir / "header.bin"
-            if header_file.exists():
+            if "header.bin" in entries:
                 try:
-                    header_info = self._analyze_header_file(header_file)
+                    header_entry = entries["header.bin"]
+                    header_info = self._analyze_header_file(Path(header_entry.path), header_entry.stat())
                     collection_info.update(header_info)
                     collection_info["recoverable"] = True
                 except Exception as e:
                     logger.warning(f"分析header文件失败 {vector_dir.name}: {e}")
             
             # 估算文档数量
-            data_file = vector_dir / "data_level0.bin"
-            if data_file.exists():
+            if "data_level0.bin" in entries:
                 try:
-                    file_size = data_file.stat().st_size
+                    file_size = entries["data_level0.bin"].stat().st_size
                     # 粗略估算：假设每个向量平均占用空间
                     if collection_info["dimension"]:
                         estimated_vector_size = collection_info["dimension"] * 4  # float32
@@ -112,7 +162,8 @@ class DataRecoveryTool:
             logger.error(f"分析向量目录失败 {vector_dir}: {e}")
             return None
     
-    def _analyze_header_file(self, header_file: Path) -> Dict[str, Any]:
+    def _analyze_header_file(self, header_file: Path,
+                             header_stat: Optional[os.stat_result] = None) -> Dict[str, Any]:
         """分析header.bin文件"""
         # 这里需要根据ChromaDB的具体格式来实现
         # 由于格式可能比较复杂，这里提供一个基础框架
@@ -126,26 +177,38 @@ class DataRecoveryTool:
                 return {
                     "dimension": None,  # 需要从二进制数据中解析
                     "header_size": len(data),
-                    "file_size": header_file.stat().st_size
+                    "file_size": (header_stat or header_file.stat()).st_size
                 }
         except Exception as e:
             logger.error(f"分析header文件失败: {e}")
             return {}
     
-    def _calculate_directory_size(self, directory: Path) -> float:
+    def _calculate_directory_size(self, directory: Path,
+                                  entries: Optional[Dict[str, os.DirEntry]] = None) -> float:
         """计算目录大小（MB）"""
+        if entries is None:
+            with os.scandir(directory) as it:
+                entries = {entry.name: entry for entry in it}
+        return self._sum_entry_sizes(entries.values()) / (1024 * 1024)
+    
+    def _sum_entry_sizes(self, entries) -> int:
+        """递归累加DirEntry的文件大小（字节）"""
         total_size = 0
-        for file_path in directory.rglob('*'):
-            if file_path.is_file():
-                total_size += file_path.stat().st_size
-        return total_size / (1024 * 1024)
+        for entry in entries:
+            if entry.is_file():
+                total_size += entry.stat().st_size
+            elif entry.is_dir():
+                with os.scandir(entry.path) as it:
+                    total_size += self._sum_entry_sizes(list(it))
+        return total_size
     
     def recover_collection(self, collection_id: str, display_name: str, 
-                          metadata: Optional[Dict[str, Any]] = None) -> bool:
+                          metadata: Optional[Dict[str, Any]] = None,
+                          client: Optional[chromadb.PersistentClient] = None) -> bool:
         """恢复单个集合"""
         try:
             vector_dir = self.chroma_path / collection_id
-            if not vector_dir.exists() or not self._is_vector_directory(vector_dir):
+            if not self._is_vector_directory(vector_dir):
                 logger.error(f"向量目录不存在或无效: {collection_id}")
                 return False
             
@@ -158,15 +221,13 @@ class DataRecoveryTool:
                 "original_id": collection_id
             })
             
-            # 创建ChromaDB客户端
-            client = chromadb.PersistentClient(path=str(self.chroma_path))
+            # 复用ChromaDB客户端，避免每次恢复都重新初始化
+            client = client or self._get_client()
             
             # 检查集合是否已存在
-            existing_collections = client.list_collections()
-            for existing in existing_collections:
-                if existing.name == collection_id:
-                    logger.warning(f"集合已存在: {collection_id}")
-                    return False
+            if self._collection_exists(collection_id):
+                logger.warning(f"集合已存在: {collection_id}")
+                return False
             
             # 尝试重新注册集合到数据库
             success = self._register_collection_to_database(
@@ -215,32 +276,22 @@ class DataRecoveryTool:
                     json.dumps(metadata)
                 ))
                 
-                # 插入元数据记录
+                # 插入元数据记录，按精确类型分派到对应的值列（bool必须先于int区分）
+                rows = []
                 for key, value in metadata.items():
-                    if isinstance(value, str):
-                        cursor.execute("""
-                            INSERT OR REPLACE INTO collection_metadata 
-                            (collection_id, key, str_value, int_value, float_value, bool_value)
-                            VALUES (?, ?, ?, NULL, NULL, NULL)
-                        """, (collection_id, key, value))
-                    elif isinstance(value, int):
-                        cursor.execute("""
-                            INSERT OR REPLACE INTO collection_metadata 
-                            (collection_id, key, str_value, int_value, float_value, bool_value)
-                            VALUES (?, ?, NULL, ?, NULL, NULL)
-                        """, (collection_id, key, value))
-                    elif isinstance(value, float):
-                        cursor.execute("""
-                            INSERT OR REPLACE INTO collection_metadata 
-                            (collection_id, key, str_value, int_value, float_value, bool_value)
-                            VALUES (?, ?, NULL, NULL, ?, NULL)
-                        """, (collection_id, key, value))
-                    elif isinstance(value, bool):
-                        cursor.execute("""
-                            INSERT OR REPLACE INTO collection_metadata 
-                            (collection_id, key, str_value, int_value, float_value, bool_value)
-                            VALUES (?, ?, NULL, NULL, NULL, ?)
-                        """, (collection_id, key, int(value)))
+                    column_cast = METADATA_VALUE_COLUMNS.get(type(value))
+                    if column_cast is None:
+                        continue
+                    column_index, cast = column_cast
+                    row = [collection_id, key, None, None, None, None]
+                    row[2 + column_index] = cast(value)
+                    rows.append(row)
+                
+                cursor.executemany("""
+                    INSERT OR REPLACE INTO collection_metadata 
+                    (collection_id, key, str_value, int_value, float_value, bool_value)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, rows)
                 
                 conn.commit()
                 logger.info(f"集合已注册到数据库: {collection_id}")
@@ -262,8 +313,11 @@ class DataRecoveryTool:
         }
         
         try:
-            with open(self.recovery_log_path, 'a', encoding='utf-8') as f:
-                f.write(json.dumps(log_entry, ensure_ascii=False) + '\n')
+            if self._log_fd is None:
+                self._log_fd = os.open(str(self.recovery_log_path),
+                                       os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            # O_APPEND保证单行写入的原子性，无需每次重新打开文件
+            os.write(self._log_fd, (json.dumps(log_entry, ensure_ascii=False) + '\n').encode('utf-8'))
         except Exception as e:
             logger.error(f"写入恢复日志失败: {e}")
     
@@ -276,12 +330,14 @@ class DataRecoveryTool:
             "details": []
         }
         
+        client = self._get_client()
+        
         for plan in recovery_plan:
             collection_id = plan["collection_id"]
             display_name = plan.get("display_name", f"recovered_{collection_id[:8]}")
             metadata = plan.get("metadata", {})
             
-            success = self.recover_collection(collection_id, display_name, metadata)
+            success = self.recover_collection(collection_id, display_name, metadata, client=client)
             
             result_detail = {
                 "collection_id": collection_id,
@@ -317,10 +373,7 @@ class DataRecoveryTool:
                 }
                 recovery_plan.append(plan)
         
-        # 按优先级和大小排序
-        recovery_plan.sort(key=lambda x: (
-            x["priority"] == "high",
-            x["metadata"]["estimated_size_mb"]
-        ), reverse=True)
+        # 按优先级（high在前）和大小（大的在前）排序
+        recovery_plan.sort(key=lambda p: (p["priority"] != "high", -p["metadata"]["original_size_mb"]))
         
         return recovery_plan
@@ -3,17 +3,124 @@
 支持多种文档格式的文本提取功能
 """
 
+import io
+import asyncio
+import codecs
+import copy
+import datetime
+import hashlib
+import json
 import logging
 import tempfile
+import threading
+import time
 import os
+import posixpath
+import re
+import sys
+import zipfile
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional, Tuple, Any
-from dataclasses import dataclass
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple, Any
+from dataclasses import dataclass, replace
 from enum import Enum
+from types import MappingProxyType
 import mimetypes
 
 logger = logging.getLogger(__name__)
 
+# Office文档XML解析：优先使用lxml（python-docx/python-pptx的依赖），否则使用标准库
+try:
+    from lxml import etree as _xml_etree
+except ImportError:
+    import xml.etree.ElementTree as _xml_etree
+
+_W_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+_W_BODY = _W_NS + 'body'
+_W_PARAGRAPH = _W_NS + 'p'
+_W_TEXT = _W_NS + 't'
+_W_TAB = _W_NS + 'tab'
+_W_BREAKS = frozenset({_W_NS + 'br', _W_NS + 'cr'})
+
+_P_NS = '{http://schemas.openxmlformats.org/presentationml/2006/main}'
+_A_NS = '{http://schemas.openxmlformats.org/drawingml/2006/main}'
+_R_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+_PKG_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+_P_SLIDE_ID = _P_NS + 'sldId'
+_P_SHAPE_TREE = _P_NS + 'cSld/' + _P_NS + 'spTree'
+_P_SHAPE = _P_NS + 'sp'
+_P_TEXT_BODY = _P_NS + 'txBody'
+_A_PARAGRAPH = _A_NS + 'p'
+_A_TEXT = _A_NS + 't'
+_A_BREAK = _A_NS + 'br'
+
+# 超过该大小的CSV使用pyarrow按块流式解析
+CSV_STREAM_THRESHOLD = 16 * 1024 * 1024  # 16MB
+CSV_STREAM_BLOCK_SIZE = 8 * 1024 * 1024  # 8MB
+
+# 表格列类型启发式判断阈值：平均长度超过该值视为content列
+HEURISTIC_CONTENT_MIN_LENGTH = 64
+# 平均长度低于该值且唯一值比例低于阈值视为metadata列（分类型短文本）
+HEURISTIC_METADATA_MAX_LENGTH = 32
+HEURISTIC_METADATA_MAX_UNIQUE_RATIO = 0.5
+
+# 解析结果缓存的最大条目数和估算总内存（按内容哈希缓存，LRU淘汰）
+PARSE_CACHE_MAX_ENTRIES = 256
+PARSE_CACHE_MAX_BYTES = 256 * 1024 * 1024  # 256MB
+# 估算内存超过该值的单个解析结果不进入缓存
+PARSE_CACHE_MAX_ENTRY_BYTES = 32 * 1024 * 1024  # 32MB
+# 估算表格数据内存时抽样的行数
+PARSE_CACHE_SIZE_SAMPLE_ROWS = 100
+
+# LLM列分析结果缓存（相同表结构和数据样本的文件复用分析结果）
+COLUMN_ANALYSIS_CACHE_MAX_ENTRIES = 512
+COLUMN_ANALYSIS_CACHE_TTL_SECONDS = 24 * 60 * 60
+
+# LLM列分析调用的超时时间（秒）
+LLM_COLUMN_ANALYSIS_TIMEOUT = 60
+
+# 可选：BLAKE3（SIMD实现，比SHA-256更快）
+try:
+    from blake3 import blake3 as _blake3
+except ImportError:
+    _blake3 = None
+
+
+def _compute_content_digest(file_content: bytes) -> str:
+    """计算文件内容摘要：优先BLAKE3，否则使用hashlib.file_digest的SHA-256（OpenSSL，支持SHA-NI）"""
+    if _blake3 is not None:
+        return "blake3:" + _blake3(file_content, max_threads=_blake3.AUTO).hexdigest()
+    if hasattr(hashlib, "file_digest"):
+        return hashlib.file_digest(io.BytesIO(file_content), "sha256").hexdigest()
+    return hashlib.sha256(file_content).hexdigest()
+
+
+def _estimate_result_size(result: "ParseResult") -> int:
+    """估算解析结果占用的内存（字节）：文本内容 + 按抽样行推算的表格数据"""
+    size = sys.getsizeof(result.content)
+    rows = result.table_data
+    if rows:
+        sample = rows[:PARSE_CACHE_SIZE_SAMPLE_ROWS]
+        sample_size = sum(
+            sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row.values())
+            for row in sample
+        )
+        size += sample_size * len(rows) // len(sample)
+    return size
+
+
+def _copy_parse_result(result: "ParseResult") -> "ParseResult":
+    """复制解析结果中的可变字段，缓存中的结果与调用方持有的结果互不影响
+
+    表格行中的值都是标量，逐行复制字典即可得到独立的表格数据。
+    """
+    return replace(
+        result,
+        metadata=copy.deepcopy(result.metadata),
+        table_data=[dict(row) for row in result.table_data] if result.table_data is not None else None,
+        column_analysis=dict(result.column_analysis) if result.column_analysis is not None else None,
+    )
+
 
 class FileFormat(Enum):
     """支持的文件格式"""
@@ -30,6 +137,72 @@ class FileFormat(Enum):
     CSV = "csv"
 
 
+# 文件扩展名 -> 文件格式
+_FORMAT_MAPPING = MappingProxyType({
+    'txt': FileFormat.TXT,
+    'pdf': FileFormat.PDF,
+    'docx': FileFormat.DOCX,
+    'doc': FileFormat.DOC,
+    'pptx': FileFormat.PPTX,
+    'ppt': FileFormat.PPT,
+    'md': FileFormat.MARKDOWN,
+    'markdown': FileFormat.MARKDOWN,
+    'rtf': FileFormat.RTF,
+    'xlsx': FileFormat.XLSX,
+    'xls': FileFormat.XLS,
+    'csv': FileFormat.CSV,
+})
+
+
+def _get_file_format(filename: str) -> Optional[FileFormat]:
+    """根据文件名获取文件格式（只取最后一个路径组成部分的扩展名，目录名中的点不计入）"""
+    if not filename:
+        return None
+    
+    extension = os.path.splitext(os.path.basename(filename))[1]
+    return _FORMAT_MAPPING.get(extension[1:].lower())
+
+
+# 优先依次严格解码尝试的编码（中文文档最常见的编码）
+_STRICT_ENCODINGS = ('utf-8', 'gbk', 'gb18030')
+# 严格解码和编码检测都失败时依次尝试的编码（latin-1可解码任意字节）
+_FALLBACK_ENCODINGS = ('utf-16', 'latin-1')
+
+
+def _compile_keyword_pattern(keywords: Iterable[str]) -> re.Pattern:
+    """将关键词列表编译为单个子串匹配正则"""
+    return re.compile('|'.join(map(re.escape, keywords)))
+
+
+# 列名关键词：content列、metadata列（标识/数值、时间、状态分类）
+_CONTENT_COLUMN_KEYWORDS = (
+    'name', 'title', 'content', 'description', 'text', 'comment', 'summary',
+    '名称', '标题', '内容', '描述', '评论', '摘要', '详情', '说明'
+)
+_ID_COLUMN_KEYWORDS = (
+    'id', '编号', 'number', 'code', '代码', 'price', '价格', 'amount', '金额',
+    'quantity', '数量', '库存', 'stock', 'count', '计数'
+)
+_TIME_COLUMN_KEYWORDS = (
+    'time', 'date', '时间', '日期', 'created', 'updated', '创建', '更新'
+)
+_STATUS_COLUMN_KEYWORDS = (
+    'status', 'state', '状态', 'type', 'category', '分类', '类型', 'tag', '标签'
+)
+
+# 简单列分析（回退方案）：列名关键词子串匹配，列名统一转为小写
+_CONTENT_COLUMN_RE = _compile_keyword_pattern(_CONTENT_COLUMN_KEYWORDS)
+_ID_COLUMN_RE = _compile_keyword_pattern(_ID_COLUMN_KEYWORDS)
+_TIME_COLUMN_RE = _compile_keyword_pattern(_TIME_COLUMN_KEYWORDS)
+_STATUS_COLUMN_RE = _compile_keyword_pattern(_STATUS_COLUMN_KEYWORDS)
+
+# 跳过LLM的关键词判断：列名按下划线/空白/驼峰拆分为词后整词匹配，
+# 避免"id"命中"valid"、"date"命中"update_count"等误判
+_COLUMN_NAME_TOKEN_RE = re.compile(r'[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+|[^\W\d_a-zA-Z]+')
+_CONTENT_COLUMN_TOKENS = frozenset(_CONTENT_COLUMN_KEYWORDS)
+_METADATA_COLUMN_TOKENS = frozenset(_ID_COLUMN_KEYWORDS + _TIME_COLUMN_KEYWORDS + _STATUS_COLUMN_KEYWORDS)
+
+
 @dataclass
 class ParseResult:
     """文件解析结果"""
@@ -53,12 +226,79 @@ class TableAnalysisResult:
     analysis_reasoning: str
 
 
+# 后台事件循环，供同步解析代码提交LLM协程，避免每次调用都创建线程池和新事件循环
+_background_loop: Optional["asyncio.AbstractEventLoop"] = None
+_background_loop_lock = threading.Lock()
+
+
+def _get_background_loop() -> "asyncio.AbstractEventLoop":
+    """获取（必要时启动）运行在守护线程中的共享事件循环"""
+    global _background_loop
+    if _background_loop is None:
+        with _background_loop_lock:
+            if _background_loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="file-parser-llm-loop", daemon=True)
+                thread.start()
+                _background_loop = loop
+    return _background_loop
+
+
+def _run_in_background_loop(coro, timeout: Optional[float] = None):
+    """在后台事件循环中运行协程并同步等待结果"""
+    future = asyncio.run_coroutine_threadsafe(coro, _get_background_loop())
+    try:
+        return future.result(timeout=timeout)
+    except BaseException:
+        future.cancel()
+        raise
+
+
+class FileTooLargeError(ValueError):
+    """文件大小超过解析限制"""
+    pass
+
+
+class _TTLCache:
+    """带过期时间的线程安全LRU缓存"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            stored_at, value = item
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
 class BaseFileParser(ABC):
     """文件解析器基类"""
     
+    max_file_size = 150 * 1024 * 1024  # 150MB
+    
     def __init__(self):
         self.supported_formats: List[FileFormat] = []
-        self.max_file_size = 150 * 1024 * 1024  # 150MB
     
     @abstractmethod
     def can_parse(self, file_format: FileFormat) -> bool:
@@ -70,33 +310,65 @@ class BaseFileParser(ABC):
         """解析文件内容"""
         pass
     
-    def _get_file_format(self, filename: str) -> Optional[FileFormat]:
-        """根据文件名获取文件格式"""
-        if not filename:
-            return None
+    def _validate_file_size(self, file_content: bytes):
+        """验证文件大小，超过限制时抛出FileTooLargeError"""
+        if len(file_content) > self.max_file_size:
+            raise FileTooLargeError("文件大小超过限制")
+    
+    def _detect_encoding(self, file_content: bytes) -> Optional[str]:
+        """检测文件内容的字符编码，无法识别时返回None"""
+        # 依次严格解码常见中文编码：charset-normalizer对短中文文本容易误判（如把GBK识别为cp949）
+        for encoding in _STRICT_ENCODINGS:
+            try:
+                file_content.decode(encoding)
+                return encoding
+            except UnicodeDecodeError:
+                continue
+        
+        return self._guess_encoding(file_content)
+    
+    def _guess_encoding(self, file_content: bytes) -> Optional[str]:
+        """常见编码都无法严格解码时，使用charset-normalizer检测编码"""
+        try:
+            from charset_normalizer import from_bytes
             
-        extension = filename.lower().split('.')[-1] if '.' in filename else ''
+            best = from_bytes(file_content).best()
+            if best is not None:
+                return best.encoding
+        except ImportError:
+            pass
+        except Exception as e:
+            logger.warning(f"编码检测失败，回退到逐个尝试: {e}")
         
-        format_mapping = {
-            'txt': FileFormat.TXT,
-            'pdf': FileFormat.PDF,
-            'docx': FileFormat.DOCX,
-            'doc': FileFormat.DOC,
-            'pptx': FileFormat.PPTX,
-            'ppt': FileFormat.PPT,
-            'md': FileFormat.MARKDOWN,
-            'markdown': FileFormat.MARKDOWN,
-            'rtf': FileFormat.RTF,
-            'xlsx': FileFormat.XLSX,
-            'xls': FileFormat.XLS,
-            'csv': FileFormat.CSV,
-        }
+        # 回退：逐个尝试兜底编码
+        for encoding in _FALLBACK_ENCODINGS:
+            try:
+                file_content.decode(encoding)
+                return encoding
+            except UnicodeDecodeError:
+                continue
         
-        return format_mapping.get(extension)
+        return None
     
-    def _validate_file_size(self, file_content: bytes) -> bool:
-        """验证文件大小"""
-        return len(file_content) <= self.max_file_size
+    def _decode_content(self, file_content: bytes) -> Tuple[Optional[str], Optional[str]]:
+        """检测编码并解码文件内容，返回(内容, 编码)，无法解码时返回(None, None)"""
+        # 严格解码成功时直接使用解码结果，不再重复解码
+        for encoding in _STRICT_ENCODINGS:
+            try:
+                return file_content.decode(encoding), encoding
+            except UnicodeDecodeError:
+                continue
+        
+        encoding = self._guess_encoding(file_content)
+        if encoding is None:
+            return None, None
+        return file_content.decode(encoding, errors='replace'), encoding
+    
+    def _count_lines(self, content: str) -> int:
+        """统计行数（不为计数而拆分出整个行列表）"""
+        if not content:
+            return 0
+        return content.count('\n') + (0 if content.endswith('\n') else 1)
     
     def _create_temp_file(self, file_content: bytes, suffix: str = '') -> str:
         """创建临时文件"""
@@ -126,27 +398,10 @@ class TextFileParser(BaseFileParser):
     def parse(self, file_content: bytes, filename: str) -> ParseResult:
         """解析文本文件"""
         try:
-            if not self._validate_file_size(file_content):
-                return ParseResult(
-                    content="",
-                    metadata={},
-                    file_format=FileFormat.TXT,
-                    success=False,
-                    error_message="文件大小超过限制"
-                )
-            
-            # 尝试多种编码
-            encodings = ['utf-8', 'gbk', 'gb2312', 'utf-16', 'latin-1']
-            content = None
-            used_encoding = None
+            self._validate_file_size(file_content)
             
-            for encoding in encodings:
-                try:
-                    content = file_content.decode(encoding)
-                    used_encoding = encoding
-                    break
-                except UnicodeDecodeError:
-                    continue
+            # 检测编码并解码
+            content, used_encoding = self._decode_content(file_content)
             
             if content is None:
                 return ParseResult(
@@ -160,7 +415,7 @@ class TextFileParser(BaseFileParser):
             metadata = {
                 "file_size": len(file_content),
                 "encoding": used_encoding,
-                "line_count": len(content.splitlines()),
+                "line_count": self._count_lines(content),
                 "char_count": len(content)
             }
             
@@ -171,6 +426,14 @@ class TextFileParser(BaseFileParser):
                 success=True
             )
             
+        except FileTooLargeError as e:
+            return ParseResult(
+                content="",
+                metadata={},
+                file_format=FileFormat.TXT,
+                success=False,
+                error_message=str(e)
+            )
         except Exception as e:
             logger.error(f"解析文本文件失败: {e}")
             return ParseResult(
@@ -195,69 +458,28 @@ class PDFFileParser(BaseFileParser):
     def parse(self, file_content: bytes, filename: str) -> ParseResult:
         """解析PDF文件"""
         try:
-            if not self._validate_file_size(file_content):
-                return ParseResult(
-                    content="",
-                    metadata={},
-                    file_format=FileFormat.PDF,
-                    success=False,
-                    error_message="文件大小超过限制"
-                )
+            self._validate_file_size(file_content)
             
-            # 优先使用pdfplumber，回退到PyPDF2
+            # 优先使用PyMuPDF，依次回退到pdfplumber和PyPDF2
             content = ""
             metadata = {}
             
-            try:
-                import pdfplumber
-                temp_path = self._create_temp_file(file_content, '.pdf')
-                
+            for extract in (self._extract_with_pymupdf,
+                            self._extract_with_pdfplumber,
+                            self._extract_with_pypdf2):
                 try:
-                    with pdfplumber.open(temp_path) as pdf:
-                        pages_text = []
-                        for page in pdf.pages:
-                            page_text = page.extract_text()
-                            if page_text:
-                                pages_text.append(page_text)
-                        
-                        content = '\n\n'.join(pages_text)
-                        metadata = {
-                            "page_count": len(pdf.pages),
-                            "file_size": len(file_content),
-                            "parser": "pdfplumber"
-                        }
-                finally:
-                    self._cleanup_temp_file(temp_path)
-                    
-            except ImportError:
-                # 回退到PyPDF2
-                try:
-                    import PyPDF2
-                    import io
-                    
-                    pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_content))
-                    pages_text = []
-                    
-                    for page in pdf_reader.pages:
-                        page_text = page.extract_text()
-                        if page_text:
-                            pages_text.append(page_text)
-                    
-                    content = '\n\n'.join(pages_text)
-                    metadata = {
-                        "page_count": len(pdf_reader.pages),
-                        "file_size": len(file_content),
-                        "parser": "PyPDF2"
-                    }
-                    
+                    content, metadata = extract(file_content)
+                    break
                 except ImportError:
-                    return ParseResult(
-                        content="",
-                        metadata={},
-                        file_format=FileFormat.PDF,
-                        success=False,
-                        error_message="缺少PDF解析库，请安装pdfplumber或PyPDF2"
-                    )
+                    continue
+            else:
+                return ParseResult(
+                    content="",
+                    metadata={},
+                    file_format=FileFormat.PDF,
+                    success=False,
+                    error_message="缺少PDF解析库，请安装PyMuPDF、pdfplumber或PyPDF2"
+                )
             
             if not content.strip():
                 return ParseResult(
@@ -275,6 +497,14 @@ class PDFFileParser(BaseFileParser):
                 success=True
             )
             
+        except FileTooLargeError as e:
+            return ParseResult(
+                content="",
+                metadata={},
+                file_format=FileFormat.PDF,
+                success=False,
+                error_message=str(e)
+            )
         except Exception as e:
             logger.error(f"解析PDF文件失败: {e}")
             return ParseResult(
@@ -284,6 +514,61 @@ class PDFFileParser(BaseFileParser):
                 success=False,
                 error_message=f"解析失败: {str(e)}"
             )
+    
+    def _extract_with_pymupdf(self, file_content: bytes) -> Tuple[str, Dict[str, Any]]:
+        """使用PyMuPDF提取文本（直接从内存打开，无需临时文件）"""
+        import fitz
+        
+        with fitz.open(stream=file_content, filetype="pdf") as doc:
+            pages_text = [page.get_text("text") for page in doc]
+            page_count = doc.page_count
+        
+        content = '\n\n'.join(text for text in pages_text if text)
+        metadata = {
+            "page_count": page_count,
+            "file_size": len(file_content),
+            "parser": "pymupdf"
+        }
+        return content, metadata
+    
+    def _extract_with_pdfplumber(self, file_content: bytes) -> Tuple[str, Dict[str, Any]]:
+        """使用pdfplumber提取文本（纯Python实现，受GIL限制，按页顺序提取）"""
+        import pdfplumber
+        
+        pages_text = []
+        # laparams=None：只提取文本，不做pdfminer的版面分析
+        with pdfplumber.open(io.BytesIO(file_content), laparams=None) as pdf:
+            page_count = len(pdf.pages)
+            for page in pdf.pages:
+                text = page.extract_text()
+                if text:
+                    pages_text.append(text)
+                # 提取后立即释放页面缓存的字符/对象，控制大文件的内存占用
+                page.close()
+        
+        content = '\n\n'.join(pages_text)
+        metadata = {
+            "page_count": page_count,
+            "file_size": len(file_content),
+            "parser": "pdfplumber"
+        }
+        return content, metadata
+    
+    def _extract_with_pypdf2(self, file_content: bytes) -> Tuple[str, Dict[str, Any]]:
+        """使用PyPDF2提取文本"""
+        import PyPDF2
+        
+        pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_content))
+        page_count = len(pdf_reader.pages)
+        pages_text = [text for text in (page.extract_text() for page in pdf_reader.pages) if text]
+        
+        content = '\n\n'.join(pages_text)
+        metadata = {
+            "page_count": page_count,
+            "file_size": len(file_content),
+            "parser": "PyPDF2"
+        }
+        return content, metadata
 
 
 class WordFileParser(BaseFileParser):
@@ -298,17 +583,10 @@ class WordFileParser(BaseFileParser):
     
     def parse(self, file_content: bytes, filename: str) -> ParseResult:
         """解析Word文档"""
-        file_format = self._get_file_format(filename)
+        file_format = _get_file_format(filename)
         
         try:
-            if not self._validate_file_size(file_content):
-                return ParseResult(
-                    content="",
-                    metadata={},
-                    file_format=file_format,
-                    success=False,
-                    error_message="文件大小超过限制"
-                )
+            self._validate_file_size(file_content)
             
             if file_format == FileFormat.DOCX:
                 return self._parse_docx(file_content)
@@ -323,6 +601,14 @@ class WordFileParser(BaseFileParser):
                     error_message="不支持的Word文档格式"
                 )
                 
+        except FileTooLargeError as e:
+            return ParseResult(
+                content="",
+                metadata={},
+                file_format=file_format,
+                success=False,
+                error_message=str(e)
+            )
         except Exception as e:
             logger.error(f"解析Word文档失败: {e}")
             return ParseResult(
@@ -336,39 +622,71 @@ class WordFileParser(BaseFileParser):
     def _parse_docx(self, file_content: bytes) -> ParseResult:
         """解析DOCX文件"""
         try:
-            import docx
-            import io
-            
-            doc = docx.Document(io.BytesIO(file_content))
-            paragraphs = []
-            
-            for paragraph in doc.paragraphs:
-                if paragraph.text.strip():
-                    paragraphs.append(paragraph.text)
-            
-            content = '\n\n'.join(paragraphs)
-            
-            metadata = {
-                "paragraph_count": len(paragraphs),
-                "file_size": len(file_content),
-                "parser": "python-docx"
-            }
-            
-            return ParseResult(
-                content=content,
-                metadata=metadata,
-                file_format=FileFormat.DOCX,
-                success=True
-            )
-            
-        except ImportError:
-            return ParseResult(
-                content="",
-                metadata={},
-                file_format=FileFormat.DOCX,
-                success=False,
-                error_message="缺少python-docx库，请安装python-docx"
-            )
+            # 直接读取word/document.xml提取段落文本，结构异常时回退到python-docx
+            paragraphs = self._extract_docx_paragraphs(file_content)
+            parser_name = "docx-xml"
+        except Exception as e:
+            logger.warning(f"DOCX XML快速解析失败，回退到python-docx: {e}")
+            try:
+                paragraphs = self._extract_docx_paragraphs_with_python_docx(file_content)
+                parser_name = "python-docx"
+            except ImportError:
+                return ParseResult(
+                    content="",
+                    metadata={},
+                    file_format=FileFormat.DOCX,
+                    success=False,
+                    error_message="缺少python-docx库，请安装python-docx"
+                )
+        
+        content = '\n\n'.join(paragraphs)
+        
+        metadata = {
+            "paragraph_count": len(paragraphs),
+            "file_size": len(file_content),
+            "parser": parser_name
+        }
+        
+        return ParseResult(
+            content=content,
+            metadata=metadata,
+            file_format=FileFormat.DOCX,
+            success=True
+        )
+    
+    def _extract_docx_paragraphs(self, file_content: bytes) -> List[str]:
+        """从word/document.xml中提取正文段落文本（跳过空段落）"""
+        with zipfile.ZipFile(io.BytesIO(file_content)) as archive:
+            document_xml = archive.read('word/document.xml')
+        
+        body = _xml_etree.fromstring(document_xml).find(_W_BODY)
+        if body is None:
+            raise ValueError("word/document.xml中缺少body元素")
+        
+        paragraphs = []
+        # 与python-docx的Document.paragraphs一致，只取body下的直接段落
+        for paragraph in body.iterfind(_W_PARAGRAPH):
+            parts = []
+            for node in paragraph.iter():
+                tag = node.tag
+                if tag == _W_TEXT:
+                    if node.text:
+                        parts.append(node.text)
+                elif tag == _W_TAB:
+                    parts.append('\t')
+                elif tag in _W_BREAKS:
+                    parts.append('\n')
+            text = ''.join(parts)
+            if text.strip():
+                paragraphs.append(text)
+        return paragraphs
+    
+    def _extract_docx_paragraphs_with_python_docx(self, file_content: bytes) -> List[str]:
+        """使用python-docx提取段落文本（跳过空段落）"""
+        import docx
+        
+        doc = docx.Document(io.BytesIO(file_content))
+        return [paragraph.text for paragraph in doc.paragraphs if paragraph.text.strip()]
     
     def _parse_doc(self, file_content: bytes) -> ParseResult:
         """解析DOC文件（老格式）"""
@@ -394,17 +712,10 @@ class PowerPointFileParser(BaseFileParser):
 
     def parse(self, file_content: bytes, filename: str) -> ParseResult:
         """解析PowerPoint文档"""
-        file_format = self._get_file_format(filename)
+        file_format = _get_file_format(filename)
 
         try:
-            if not self._validate_file_size(file_content):
-                return ParseResult(
-                    content="",
-                    metadata={},
-                    file_format=file_format,
-                    success=False,
-                    error_message="文件大小超过限制"
-                )
+            self._validate_file_size(file_content)
 
             if file_format == FileFormat.PPTX:
                 return self._parse_pptx(file_content)
@@ -419,6 +730,14 @@ class PowerPointFileParser(BaseFileParser):
                     error_message="不支持的PowerPoint文档格式"
                 )
 
+        except FileTooLargeError as e:
+            return ParseResult(
+                content="",
+                metadata={},
+                file_format=file_format,
+                success=False,
+                error_message=str(e)
+            )
         except Exception as e:
             logger.error(f"解析PowerPoint文档失败: {e}")
             return ParseResult(
@@ -432,46 +751,99 @@ class PowerPointFileParser(BaseFileParser):
     def _parse_pptx(self, file_content: bytes) -> ParseResult:
         """解析PPTX文件"""
         try:
-            from pptx import Presentation
-            import io
-
-            prs = Presentation(io.BytesIO(file_content))
-            slides_text = []
-
-            for slide_num, slide in enumerate(prs.slides, 1):
-                slide_content = []
-                slide_content.append(f"=== 幻灯片 {slide_num} ===")
-
-                for shape in slide.shapes:
-                    if hasattr(shape, "text") and shape.text.strip():
-                        slide_content.append(shape.text.strip())
+            # 直接读取幻灯片XML提取文本，结构异常时回退到python-pptx
+            slides_shape_texts = self._extract_pptx_slide_texts(file_content)
+            parser_name = "pptx-xml"
+        except Exception as e:
+            logger.warning(f"PPTX XML快速解析失败，回退到python-pptx: {e}")
+            try:
+                slides_shape_texts = self._extract_pptx_slide_texts_with_python_pptx(file_content)
+                parser_name = "python-pptx"
+            except ImportError:
+                return ParseResult(
+                    content="",
+                    metadata={},
+                    file_format=FileFormat.PPTX,
+                    success=False,
+                    error_message="缺少python-pptx库，请安装python-pptx"
+                )
 
-                if len(slide_content) > 1:  # 除了标题外还有内容
-                    slides_text.append('\n'.join(slide_content))
+        slides_text = []
+        for slide_num, shape_texts in enumerate(slides_shape_texts, 1):
+            if shape_texts:  # 除了标题外还有内容
+                slides_text.append('\n'.join([f"=== 幻灯片 {slide_num} ==="] + shape_texts))
 
-            content = '\n\n'.join(slides_text)
+        content = '\n\n'.join(slides_text)
 
-            metadata = {
-                "slide_count": len(prs.slides),
-                "file_size": len(file_content),
-                "parser": "python-pptx"
-            }
+        metadata = {
+            "slide_count": len(slides_shape_texts),
+            "file_size": len(file_content),
+            "parser": parser_name
+        }
 
-            return ParseResult(
-                content=content,
-                metadata=metadata,
-                file_format=FileFormat.PPTX,
-                success=True
-            )
+        return ParseResult(
+            content=content,
+            metadata=metadata,
+            file_format=FileFormat.PPTX,
+            success=True
+        )
 
-        except ImportError:
-            return ParseResult(
-                content="",
-                metadata={},
-                file_format=FileFormat.PPTX,
-                success=False,
-                error_message="缺少python-pptx库，请安装python-pptx"
-            )
+    def _extract_pptx_slide_texts(self, file_content: bytes) -> List[List[str]]:
+        """按演示文稿中的幻灯片顺序，提取每张幻灯片中各形状的非空文本"""
+        with zipfile.ZipFile(io.BytesIO(file_content)) as archive:
+            presentation = _xml_etree.fromstring(archive.read('ppt/presentation.xml'))
+            relationships = _xml_etree.fromstring(archive.read('ppt/_rels/presentation.xml.rels'))
+
+            targets = {rel.get('Id'): rel.get('Target') for rel in relationships.iter(_PKG_REL_NS + 'Relationship')}
+            slide_parts = []
+            for slide_id in presentation.iter(_P_SLIDE_ID):
+                target = targets[slide_id.get(_R_NS + 'id')]
+                if target.startswith('/'):
+                    slide_parts.append(target.lstrip('/'))
+                else:
+                    slide_parts.append(posixpath.normpath(posixpath.join('ppt', target)))
+
+            slides_xml = [archive.read(part) for part in slide_parts]
+
+        slides_shape_texts = []
+        for slide_xml in slides_xml:
+            shape_tree = _xml_etree.fromstring(slide_xml).find(_P_SHAPE_TREE)
+            shape_texts = []
+            if shape_tree is not None:
+                # 与python-pptx一致：只取顶层带文本框的形状
+                for shape in shape_tree.iterfind(_P_SHAPE):
+                    text_body = shape.find(_P_TEXT_BODY)
+                    if text_body is None:
+                        continue
+                    paragraphs = []
+                    for paragraph in text_body.iterfind(_A_PARAGRAPH):
+                        parts = []
+                        for node in paragraph.iter(_A_TEXT, _A_BREAK):
+                            if node.tag == _A_BREAK:
+                                parts.append('\n')
+                            elif node.text:
+                                parts.append(node.text)
+                        paragraphs.append(''.join(parts))
+                    text = '\n'.join(paragraphs).strip()
+                    if text:
+                        shape_texts.append(text)
+            slides_shape_texts.append(shape_texts)
+        return slides_shape_texts
+
+    def _extract_pptx_slide_texts_with_python_pptx(self, file_content: bytes) -> List[List[str]]:
+        """使用python-pptx提取每张幻灯片中各形状的非空文本"""
+        from pptx import Presentation
+
+        prs = Presentation(io.BytesIO(file_content))
+
+        slides_shape_texts = []
+        for slide in prs.slides:
+            shape_texts = []
+            for shape in slide.shapes:
+                if hasattr(shape, "text") and shape.text.strip():
+                    shape_texts.append(shape.text.strip())
+            slides_shape_texts.append(shape_texts)
+        return slides_shape_texts
 
     def _parse_ppt(self, file_content: bytes) -> ParseResult:
         """解析PPT文件（老格式）"""
@@ -490,6 +862,7 @@ class MarkdownFileParser(BaseFileParser):
     def __init__(self):
         super().__init__()
         self.supported_formats = [FileFormat.MARKDOWN]
+        self._markdown_it = None
 
     def can_parse(self, file_format: FileFormat) -> bool:
         return file_format in self.supported_formats
@@ -497,27 +870,10 @@ class MarkdownFileParser(BaseFileParser):
     def parse(self, file_content: bytes, filename: str) -> ParseResult:
         """解析Markdown文件"""
         try:
-            if not self._validate_file_size(file_content):
-                return ParseResult(
-                    content="",
-                    metadata={},
-                    file_format=FileFormat.MARKDOWN,
-                    success=False,
-                    error_message="文件大小超过限制"
-                )
-
-            # 尝试多种编码
-            encodings = ['utf-8', 'gbk', 'gb2312', 'utf-16', 'latin-1']
-            content = None
-            used_encoding = None
+            self._validate_file_size(file_content)
 
-            for encoding in encodings:
-                try:
-                    content = file_content.decode(encoding)
-                    used_encoding = encoding
-                    break
-                except UnicodeDecodeError:
-                    continue
+            # 检测编码并解码
+            content, used_encoding = self._decode_content(file_content)
 
             if content is None:
                 return ParseResult(
@@ -529,48 +885,31 @@ class MarkdownFileParser(BaseFileParser):
                 )
 
             # 可选：转换Markdown为纯文本
-            try:
-                import markdown
-                from bs4 import BeautifulSoup
-
-                # 转换Markdown为HTML
-                html = markdown.markdown(content)
-                # 提取纯文本
-                soup = BeautifulSoup(html, 'html.parser')
-                plain_text = soup.get_text()
-
-                metadata = {
-                    "file_size": len(file_content),
-                    "encoding": used_encoding,
-                    "line_count": len(content.splitlines()),
-                    "parser": "markdown+beautifulsoup",
-                    "original_markdown": True
-                }
-
-                return ParseResult(
-                    content=plain_text,
-                    metadata=metadata,
-                    file_format=FileFormat.MARKDOWN,
-                    success=True
-                )
+            plain_text, parser_name = self._markdown_to_text(content)
 
-            except ImportError:
-                # 如果没有markdown库，直接返回原始内容
-                metadata = {
-                    "file_size": len(file_content),
-                    "encoding": used_encoding,
-                    "line_count": len(content.splitlines()),
-                    "parser": "raw_text",
-                    "original_markdown": True
-                }
+            metadata = {
+                "file_size": len(file_content),
+                "encoding": used_encoding,
+                "line_count": self._count_lines(content),
+                "parser": parser_name,
+                "original_markdown": True
+            }
 
-                return ParseResult(
-                    content=content,
-                    metadata=metadata,
-                    file_format=FileFormat.MARKDOWN,
-                    success=True
-                )
+            return ParseResult(
+                content=plain_text,
+                metadata=metadata,
+                file_format=FileFormat.MARKDOWN,
+                success=True
+            )
 
+        except FileTooLargeError as e:
+            return ParseResult(
+                content="",
+                metadata={},
+                file_format=FileFormat.MARKDOWN,
+                success=False,
+                error_message=str(e)
+            )
         except Exception as e:
             logger.error(f"解析Markdown文件失败: {e}")
             return ParseResult(
@@ -582,6 +921,49 @@ class MarkdownFileParser(BaseFileParser):
             )
 
 
+    def _markdown_to_text(self, content: str) -> Tuple[str, str]:
+        """将Markdown转换为纯文本，返回(文本, 解析器名称)"""
+        # 优先使用markdown-it-py直接遍历语法树，不生成HTML中间结果
+        try:
+            from markdown_it import MarkdownIt
+
+            if self._markdown_it is None:
+                self._markdown_it = MarkdownIt('commonmark')
+            return self._markdown_tokens_to_text(self._markdown_it.parse(content)), "markdown-it"
+        except ImportError:
+            pass
+
+        try:
+            import markdown
+            from bs4 import BeautifulSoup
+
+            # 转换Markdown为HTML后提取纯文本
+            html = markdown.markdown(content)
+            soup = BeautifulSoup(html, 'html.parser')
+            return soup.get_text(), "markdown+beautifulsoup"
+        except ImportError:
+            # 如果没有markdown库，直接返回原始内容
+            return content, "raw_text"
+
+    def _markdown_tokens_to_text(self, tokens) -> str:
+        """从markdown-it的token流中提取文本，每个块级元素一行"""
+        blocks = []
+        for token in tokens:
+            if token.type == 'inline':
+                parts = []
+                for child in token.children or ():
+                    if child.type in ('text', 'code_inline'):
+                        parts.append(child.content)
+                    elif child.type in ('softbreak', 'hardbreak'):
+                        parts.append('\n')
+                text = ''.join(parts)
+                if text:
+                    blocks.append(text)
+            elif token.type in ('fence', 'code_block'):
+                blocks.append(token.content.rstrip('\n'))
+        return '\n'.join(blocks)
+
+
 class RTFFileParser(BaseFileParser):
     """RTF文件解析器"""
 
@@ -595,32 +977,21 @@ class RTFFileParser(BaseFileParser):
     def parse(self, file_content: bytes, filename: str) -> ParseResult:
         """解析RTF文件"""
         try:
-            if not self._validate_file_size(file_content):
-                return ParseResult(
-                    content="",
-                    metadata={},
-                    file_format=FileFormat.RTF,
-                    success=False,
-                    error_message="文件大小超过限制"
-                )
+            self._validate_file_size(file_content)
 
             try:
                 from striprtf.striprtf import rtf_to_text
 
                 # 尝试解码RTF内容
-                try:
-                    rtf_content = file_content.decode('utf-8')
-                except UnicodeDecodeError:
-                    try:
-                        rtf_content = file_content.decode('latin-1')
-                    except UnicodeDecodeError:
-                        return ParseResult(
-                            content="",
-                            metadata={},
-                            file_format=FileFormat.RTF,
-                            success=False,
-                            error_message="无法解码RTF文件内容"
-                        )
+                rtf_content, _ = self._decode_content(file_content)
+                if rtf_content is None:
+                    return ParseResult(
+                        content="",
+                        metadata={},
+                        file_format=FileFormat.RTF,
+                        success=False,
+                        error_message="无法解码RTF文件内容"
+                    )
 
                 # 提取纯文本
                 content = rtf_to_text(rtf_content)
@@ -646,6 +1017,14 @@ class RTFFileParser(BaseFileParser):
                     error_message="缺少striprtf库，请安装striprtf"
                 )
 
+        except FileTooLargeError as e:
+            return ParseResult(
+                content="",
+                metadata={},
+                file_format=FileFormat.RTF,
+                success=False,
+                error_message=str(e)
+            )
         except Exception as e:
             logger.error(f"解析RTF文件失败: {e}")
             return ParseResult(
@@ -660,6 +1039,9 @@ class RTFFileParser(BaseFileParser):
 class TableFileParser(BaseFileParser):
     """表格文件解析器（Excel和CSV）"""
 
+    # 所有实例共享的LLM列分析缓存
+    _column_analysis_cache = _TTLCache(COLUMN_ANALYSIS_CACHE_MAX_ENTRIES, COLUMN_ANALYSIS_CACHE_TTL_SECONDS)
+
     def __init__(self):
         super().__init__()
         self.supported_formats = [FileFormat.XLSX, FileFormat.XLS, FileFormat.CSV]
@@ -669,17 +1051,10 @@ class TableFileParser(BaseFileParser):
 
     def parse(self, file_content: bytes, filename: str) -> ParseResult:
         """解析表格文件"""
-        file_format = self._get_file_format(filename)
+        file_format = _get_file_format(filename)
 
         try:
-            if not self._validate_file_size(file_content):
-                return ParseResult(
-                    content="",
-                    metadata={},
-                    file_format=file_format,
-                    success=False,
-                    error_message="文件大小超过限制"
-                )
+            self._validate_file_size(file_content)
 
             if file_format in [FileFormat.XLSX, FileFormat.XLS]:
                 return self._parse_excel(file_content, file_format)
@@ -694,6 +1069,14 @@ class TableFileParser(BaseFileParser):
                     error_message="不支持的表格文件格式"
                 )
 
+        except FileTooLargeError as e:
+            return ParseResult(
+                content="",
+                metadata={},
+                file_format=file_format,
+                success=False,
+                error_message=str(e)
+            )
         except Exception as e:
             logger.error(f"解析表格文件失败: {e}")
             return ParseResult(
@@ -708,8 +1091,6 @@ class TableFileParser(BaseFileParser):
         """解析Excel文件"""
         try:
             import pandas as pd
-            import io
-            import numpy as np
 
             # 读取Excel文件
             df = pd.read_excel(io.BytesIO(file_content), engine='openpyxl' if file_format == FileFormat.XLSX else 'xlrd')
@@ -744,7 +1125,7 @@ class TableFileParser(BaseFileParser):
             column_analysis = self._analyze_table_columns(df)
 
             # 生成文档内容（每行一个文档）
-            documents = self._convert_table_to_documents(table_data, column_analysis)
+            documents = self._convert_dataframe_to_documents(df, column_analysis)
 
             metadata = {
                 "file_size": len(file_content),
@@ -793,31 +1174,26 @@ class TableFileParser(BaseFileParser):
         # 2. 删除完全为空的列
         df = df.dropna(axis=1, how='all')
 
-        # 3. 清理列名
-        # 移除列名中的换行符和多余空格
-        df.columns = [str(col).replace('\n', ' ').replace('\r', ' ').strip() for col in df.columns]
-
-        # 4. 处理Unnamed列 - 如果有相邻的有意义列名，则合并
-        new_columns = []
-        for i, col in enumerate(df.columns):
-            if str(col).startswith('Unnamed'):
-                # 查找前一个有意义的列名
-                if i > 0 and not str(df.columns[i-1]).startswith('Unnamed'):
-                    # 如果这个Unnamed列有数据，则重命名为前一列的扩展
-                    if not df[col].isna().all():
-                        new_columns.append(f"{df.columns[i-1]}_详细")
-                    else:
-                        new_columns.append(col)  # 保持原名，后续删除
-                else:
-                    new_columns.append(col)
-            else:
-                new_columns.append(col)
+        if len(df.columns) > 0:
+            # 3. 清理列名
+            # 移除列名中的换行符和多余空格（向量化字符串操作）
+            columns = pd.Index(df.columns).astype(str).str.replace(r'[\n\r]', ' ', regex=True).str.strip()
+            column_values = columns.to_numpy(dtype=object)
+
+            # 一次性计算每列是否全为空
+            all_nan = df.isna().all(axis=0).to_numpy()
+            unnamed = np.asarray(columns.str.startswith('Unnamed'), dtype=bool)
 
-        df.columns = new_columns
+            # 4. 处理Unnamed列 - 如果前一列是有意义的列名且本列有数据，则重命名为前一列的扩展
+            prev_named = np.concatenate(([False], ~unnamed[:-1]))
+            prev_names = np.concatenate(([""], column_values[:-1]))
+            rename_mask = unnamed & prev_named & ~all_nan
+            df.columns = np.where(rename_mask, prev_names + "_详细", column_values)
 
-        # 5. 删除以"Unnamed"开头的空列
-        unnamed_cols = [col for col in df.columns if str(col).startswith('Unnamed') and df[col].isna().all()]
-        df = df.drop(columns=unnamed_cols)
+            # 5. 删除以"Unnamed"开头的空列
+            drop_mask = unnamed & ~rename_mask & all_nan
+            if drop_mask.any():
+                df = df.loc[:, ~drop_mask]
 
         # 6. 过滤掉主要内容为空的行（保留至少有3个非空值的行）
         min_non_null = max(1, len(df.columns) // 3)  # 至少1/3的列有值
@@ -832,21 +1208,26 @@ class TableFileParser(BaseFileParser):
         """解析CSV文件"""
         try:
             import pandas as pd
-            import io
 
-            # 尝试不同的编码
-            encodings = ['utf-8', 'gbk', 'gb2312', 'utf-16', 'latin-1']
+            # 检测编码后直接在字节流上解析，避免先解码为字符串再交给pandas
+            # （带BOM的UTF-8文件使用utf-8-sig，避免BOM混入第一个列名）
             df = None
-            used_encoding = None
+            if file_content.startswith(codecs.BOM_UTF8):
+                used_encoding = 'utf-8-sig'
+            else:
+                used_encoding = self._detect_encoding(file_content)
 
-            for encoding in encodings:
+            # 大文件按块流式解析，避免同时持有完整DataFrame和字典列表
+            if used_encoding is not None and len(file_content) >= CSV_STREAM_THRESHOLD:
+                streamed_result = self._parse_csv_streaming(file_content, used_encoding)
+                if streamed_result is not None:
+                    return streamed_result
+
+            if used_encoding is not None:
                 try:
-                    content_str = file_content.decode(encoding)
-                    df = pd.read_csv(io.StringIO(content_str))
-                    used_encoding = encoding
-                    break
-                except (UnicodeDecodeError, pd.errors.EmptyDataError):
-                    continue
+                    df = self._read_csv_bytes(pd, file_content, used_encoding)
+                except pd.errors.EmptyDataError:
+                    df = None
 
             if df is None or df.empty:
                 return ParseResult(
@@ -864,7 +1245,7 @@ class TableFileParser(BaseFileParser):
             column_analysis = self._analyze_table_columns(df)
 
             # 生成文档内容（每行一个文档）
-            documents = self._convert_table_to_documents(table_data, column_analysis)
+            documents = self._convert_dataframe_to_documents(df, column_analysis)
 
             metadata = {
                 "file_size": len(file_content),
@@ -894,16 +1275,138 @@ class TableFileParser(BaseFileParser):
                 error_message="缺少pandas库，请安装pandas"
             )
 
+    def _parse_csv_streaming(self, file_content: bytes, encoding: str) -> Optional[ParseResult]:
+        """使用pyarrow流式读取CSV，逐块生成文档；不可用或失败时返回None由pandas路径处理"""
+        try:
+            import pyarrow as pa
+            from pyarrow import csv as pacsv
+        except ImportError:
+            return None
+
+        try:
+            read_options = pacsv.ReadOptions(block_size=CSV_STREAM_BLOCK_SIZE, encoding=encoding)
+            reader = pacsv.open_csv(io.BytesIO(file_content), read_options=read_options)
+
+            # pyarrow会把ISO格式的日期/时间推断为时间类型，这些列按字符串重新打开，与pandas路径保持一致
+            temporal_columns = {
+                field.name: pa.string() for field in reader.schema
+                if pa.types.is_temporal(field.type)
+            }
+            if temporal_columns:
+                reader = pacsv.open_csv(
+                    io.BytesIO(file_content),
+                    read_options=read_options,
+                    convert_options=pacsv.ConvertOptions(column_types=temporal_columns)
+                )
+            columns = reader.schema.names
+
+            table_data = []
+            content_buffer = io.StringIO()
+            column_analysis = None
+
+            for batch in reader:
+                if batch.num_rows == 0:
+                    continue
+
+                batch_df = batch.to_pandas()
+
+                # 列分析只需要样本数据，使用第一个数据块
+                if column_analysis is None:
+                    column_analysis = self._analyze_table_columns(batch_df)
+
+                # 文档逐条写入缓冲区，不保留中间的文档列表
+                for document in self._convert_dataframe_to_documents(batch_df, column_analysis):
+                    if content_buffer.tell():
+                        content_buffer.write("\n\n")
+                    content_buffer.write(document)
+                table_data.extend(batch.to_pylist())
+        except Exception as e:
+            logger.warning(f"流式解析CSV失败，回退到pandas: {e}")
+            return None
+
+        if not table_data:
+            return None
+
+        metadata = {
+            "file_size": len(file_content),
+            "encoding": encoding,
+            "row_count": len(table_data),
+            "column_count": len(columns),
+            "columns": ", ".join(str(col) for col in columns),  # 转换为字符串
+            "parser": "pyarrow"
+        }
+
+        return ParseResult(
+            content=content_buffer.getvalue(),
+            metadata=metadata,
+            file_format=FileFormat.CSV,
+            success=True,
+            is_table=True,
+            table_data=table_data,
+            column_analysis=column_analysis
+        )
+
+    def _read_csv_bytes(self, pd, file_content: bytes, encoding: str):
+        """使用pyarrow引擎解析CSV字节流，不可用时回退到C引擎；日期/时间列与C引擎一样保留原始字符串"""
+        try:
+            df = pd.read_csv(io.BytesIO(file_content), encoding=encoding, engine='pyarrow')
+            temporal_columns = self._temporal_columns(pd, df)
+            if temporal_columns:
+                # pyarrow会把ISO格式的日期/时间解析为date/Timestamp对象，这些列按字符串重新读取
+                df = pd.read_csv(io.BytesIO(file_content), encoding=encoding, engine='pyarrow',
+                                 dtype={col: str for col in temporal_columns})
+            return df
+        except (ImportError, ValueError) as e:
+            if isinstance(e, pd.errors.EmptyDataError):
+                raise
+            return pd.read_csv(io.BytesIO(file_content), encoding=encoding, engine='c')
+
+    def _temporal_columns(self, pd, df) -> List[Any]:
+        """返回被解析为日期/时间类型的列（C引擎不推断日期，这些列保持字符串）"""
+        temporal_columns = []
+        for col in df.columns:
+            values = df[col]
+            if pd.api.types.is_datetime64_any_dtype(values) or pd.api.types.is_timedelta64_dtype(values):
+                temporal_columns.append(col)
+            elif values.dtype == object:
+                first_valid = values.first_valid_index()
+                if first_valid is not None and isinstance(values[first_valid], (datetime.date, datetime.time)):
+                    temporal_columns.append(col)
+        return temporal_columns
+
     def _analyze_table_columns(self, df) -> Dict[str, str]:
         """使用LLM智能分析表格列类型（基于标题行和前10行数据样本）"""
         try:
+            # 所有列都能通过统计特征明确判断时，跳过LLM调用
+            heuristic_result = self._heuristic_column_analysis(df)
+            if heuristic_result is not None:
+                logger.info(f"列类型特征明确，跳过LLM分析: {heuristic_result}")
+                return heuristic_result
+
+            # 所有列名都能由关键词整词匹配明确判断时，同样跳过LLM调用
+            keyword_result = self._keyword_column_analysis(df)
+            if len(keyword_result) == len(df.columns):
+                logger.info(f"列名均命中关键词规则，跳过LLM分析: {keyword_result}")
+                return keyword_result
+
+            # 只把未命中关键词的列交给LLM判断
+            remaining_df = df[[col for col in df.columns if col not in keyword_result]] if keyword_result else df
+
+            # 相同表结构和数据样本直接复用之前的LLM分析结果
+            cache_key = self._column_analysis_cache_key(remaining_df)
+            cached_result = self._column_analysis_cache.get(cache_key)
+            if cached_result is not None:
+                logger.info(f"命中列分析缓存: {cached_result}")
+                return self._merge_column_analysis(df, keyword_result, cached_result)
+
             logger.info("开始LLM智能列分析")
 
             # 调用LLM分析（传入标题行和前10行数据）
-            analysis_result = self._call_llm_for_column_analysis_with_sample_data(df)
+            analysis_result = self._call_llm_for_column_analysis(remaining_df)
             if analysis_result:
                 logger.info(f"LLM列分析成功: {analysis_result}")
-                return analysis_result
+                self._column_analysis_cache.set(cache_key, dict(analysis_result))
+                return self._merge_column_analysis(df, keyword_result, analysis_result)
             else:
                 logger.warning("LLM列分析失败，使用简单规则分析")
                 return self._simple_column_analysis(df)
@@ -912,94 +1415,77 @@ class TableFileParser(BaseFileParser):
             logger.warning(f"智能列分析失败，使用简单规则: {e}")
             return self._simple_column_analysis(df)
 
-    def _call_llm_for_column_analysis_with_sample_data(self, df) -> Optional[Dict[str, str]]:
-        """调用LLM分析表格列（基于标题行和前10行数据样本）"""
-        try:
-            from llm_client import get_llm_client
+    def _merge_column_analysis(self, df, keyword_result: Dict[str, str], analysis_result: Dict[str, str]) -> Dict[str, str]:
+        """合并关键词判断结果和LLM分析结果，按表格列顺序排列"""
+        if not keyword_result:
+            return dict(analysis_result)
+        merged = {**analysis_result, **keyword_result}
+        return {col: merged[col] for col in df.columns if col in merged}
+
+    def _column_analysis_cache_key(self, df) -> Tuple[Tuple[str, ...], Tuple[str, ...], str]:
+        """列分析缓存键：(列名, 列数据类型, 前10行样本的哈希)"""
+        sample_csv = df.head(10).to_csv(index=False)
+        return (
+            tuple(str(col) for col in df.columns),
+            tuple(str(dtype) for dtype in df.dtypes),
+            hashlib.sha256(sample_csv.encode('utf-8')).hexdigest()
+        )
 
-            llm_client = get_llm_client()
-            if not llm_client:
-                logger.warning("LLM客户端不可用")
-                return None
+    def _heuristic_column_analysis(self, df) -> Optional[Dict[str, str]]:
+        """基于数据类型和文本统计特征判断列类型，存在无法明确判断的列时返回None"""
+        import pandas as pd
 
-            # 构建分析提示（包含标题行和前10行数据样本）
-            prompt = self._build_column_analysis_prompt_with_sample_data(df)
+        if len(df) == 0:
+            return None
 
-            # 调用LLM（同步方式）
-            import asyncio
-            messages = [{"role": "user", "content": prompt}]
+        column_analysis = {}
+        for col in df.columns:
+            values = df[col].dropna()
+            if values.empty or pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+                column_analysis[col] = 'metadata'
+                continue
 
-            # 检查是否已有运行中的事件循环
-            try:
-                # 尝试获取当前事件循环
-                loop = asyncio.get_running_loop()
-                # 如果有运行中的循环，使用 asyncio.create_task 在当前循环中运行
-                import concurrent.futures
-
-                async def collect_response():
-                    response_parts = []
-                    async for chunk in llm_client.stream_chat(messages, temperature=0.1, max_tokens=1500):
-                        if chunk.get('content'):
-                            response_parts.append(chunk['content'])
-                    return ''.join(response_parts)
-
-                # 在线程池中运行异步函数
-                with concurrent.futures.ThreadPoolExecutor() as executor:
-                    future = executor.submit(asyncio.run, collect_response())
-                    response = future.result()
-
-            except RuntimeError:
-                # 没有运行中的事件循环，创建新的
-                async def collect_response():
-                    response_parts = []
-                    async for chunk in llm_client.stream_chat(messages, temperature=0.1, max_tokens=1500):
-                        if chunk.get('content'):
-                            response_parts.append(chunk['content'])
-                    return ''.join(response_parts)
-
-                response = asyncio.run(collect_response())
+            avg_length = values.astype(str).str.len().mean()
+            unique_ratio = values.nunique() / len(df)
 
-            logger.info(f"LLM分析响应: {response[:200]}...")  # 记录前200字符
+            if avg_length > HEURISTIC_CONTENT_MIN_LENGTH:
+                column_analysis[col] = 'content'
+            elif avg_length < HEURISTIC_METADATA_MAX_LENGTH and unique_ratio < HEURISTIC_METADATA_MAX_UNIQUE_RATIO:
+                column_analysis[col] = 'metadata'
+            else:
+                # 存在特征不明确的列，交给LLM判断
+                return None
 
-            # 解析响应
-            return self._parse_llm_column_response(response)
+        return column_analysis
 
-        except Exception as e:
-            logger.error(f"LLM列分析失败: {e}")
-            return None
+    async def _collect_llm(self, llm_client, prompt: str, max_tokens: int) -> str:
+        """以单条用户消息调用LLM，收集完整的流式响应"""
+        messages = [{"role": "user", "content": prompt}]
+        response_parts = []
+        async for chunk in llm_client.stream_chat(messages, temperature=0.1, max_tokens=max_tokens):
+            if chunk.get('content'):
+                response_parts.append(chunk['content'])
+        return ''.join(response_parts)
 
-    def _call_llm_for_column_analysis(self, columns_info: Dict) -> Optional[Dict[str, str]]:
-        """调用LLM分析表格列（旧版本，保留兼容性）"""
+    def _call_llm_for_column_analysis(self, df) -> Optional[Dict[str, str]]:
+        """调用LLM分析表格列（基于标题行和前10行数据样本）"""
         try:
             from llm_client import get_llm_client
 
             llm_client = get_llm_client()
             if not llm_client:
+                logger.warning("LLM客户端不可用")
                 return None
 
-            # 构建分析提示
-            prompt = self._build_column_analysis_prompt(columns_info)
-
-            # 调用LLM（同步方式）
-            import asyncio
-            messages = [{"role": "user", "content": prompt}]
-
-            # 创建事件循环并运行异步方法
-            try:
-                loop = asyncio.get_event_loop()
-            except RuntimeError:
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
+            # 构建分析提示（包含标题行和前10行数据样本）
+            prompt = self._build_column_analysis_prompt_with_sample_data(df)
 
-            # 收集流式响应
-            response_parts = []
-            async def collect_response():
-                async for chunk in llm_client.stream_chat(messages, temperature=0.1, max_tokens=1000):
-                    if chunk.get('content'):
-                        response_parts.append(chunk['content'])
+            # 提交到共享的后台事件循环执行，不会重入调用方所在的事件循环
+            response = _run_in_background_loop(
+                self._collect_llm(llm_client, prompt, max_tokens=1500), timeout=LLM_COLUMN_ANALYSIS_TIMEOUT
+            )
 
-            loop.run_until_complete(collect_response())
-            response = ''.join(response_parts)
+            logger.info(f"LLM分析响应: {response[:200]}...")  # 记录前200字符
 
             # 解析响应
             return self._parse_llm_column_response(response)
@@ -1012,7 +1498,7 @@ class TableFileParser(BaseFileParser):
         """构建列分析提示（使用完整数据样本）"""
         # 从columns_info中获取DataFrame（需要修改调用方式）
         # 这里先用原有逻辑，稍后会修改整个流程
-        prompt = """请分析以下表格的列，判断每列应该作为元数据(metadata)还是内容(content)存储到向量数据库中。
+        parts = ["""请分析以下表格的列，判断每列应该作为元数据(metadata)还是内容(content)存储到向量数据库中。
 
 分析规则：
 - **content列**：包含丰富文本信息，适合语义搜索的列
@@ -1026,16 +1512,18 @@ class TableFileParser(BaseFileParser):
   * 用于过滤和组织数据，而非语义搜索
 
 表格列信息：
-"""
+"""]
 
         for col, info in columns_info.items():
-            prompt += f"\n列名: {col}\n"
-            prompt += f"数据类型: {info['dtype']}\n"
-            prompt += f"示例值: {info['sample_values']}\n"
-            prompt += f"唯一值数量: {info['unique_count']}\n"
-            prompt += "---\n"
+            parts.append(
+                f"\n列名: {col}\n"
+                f"数据类型: {info['dtype']}\n"
+                f"示例值: {info['sample_values']}\n"
+                f"唯一值数量: {info['unique_count']}\n"
+                "---\n"
+            )
 
-        prompt += """
+        parts.append("""
 请以JSON格式返回分析结果，格式如下：
 {
     "column_name1": "metadata",
@@ -1043,9 +1531,13 @@ class TableFileParser(BaseFileParser):
     ...
 }
 
-只返回JSON，不要其他解释。"""
+只返回JSON，不要其他解释。""")
 
-        return prompt
+        return ''.join(parts)
+
+    def _prepare_prompt_sample(self, df_sample):
+        """将样本数据整体转换为去除首尾空白的字符串，空值转为空字符串"""
+        return df_sample.astype(str).where(df_sample.notna(), "").apply(lambda col: col.str.strip())
 
     def _build_column_analysis_prompt_with_data(self, df) -> str:
         """构建列分析提示（包含完整数据样本）"""
@@ -1053,7 +1545,7 @@ class TableFileParser(BaseFileParser):
         sample_rows = min(15, len(df))
         df_sample = df.head(sample_rows)
 
-        prompt = f"""请分析以下表格数据，判断每列应该作为元数据(metadata)还是内容(content)存储到向量数据库中。
+        parts = [f"""请分析以下表格数据，判断每列应该作为元数据(metadata)还是内容(content)存储到向量数据库中。
 
 **分析规则：**
 
@@ -1071,26 +1563,22 @@ class TableFileParser(BaseFileParser):
 
 **表格数据样本（共{len(df)}行，显示前{sample_rows}行）：**
 
-"""
+"""]
 
         # 将DataFrame转换为易读的表格格式
         # 表头
         headers = list(df_sample.columns)
-        prompt += "| " + " | ".join(headers) + " |\n"
-        prompt += "|" + "|".join([" --- " for _ in headers]) + "|\n"
-
-        # 数据行
-        for idx, row in df_sample.iterrows():
-            row_data = []
-            for col in headers:
-                value = str(row[col]) if row[col] is not None else ""
-                # 限制单元格长度，避免过长
-                if len(value) > 50:
-                    value = value[:47] + "..."
-                row_data.append(value)
-            prompt += "| " + " | ".join(row_data) + " |\n"
-
-        prompt += f"""
+        parts.append("| " + " | ".join(headers) + " |\n")
+        parts.append("|" + "|".join([" --- " for _ in headers]) + "|\n")
+
+        # 数据行：整体转换为字符串，空值显示为空
+        if not df_sample.empty:
+            cells = self._prepare_prompt_sample(df_sample)
+            # 限制单元格长度，避免过长
+            cells = cells.apply(lambda col: col.where(col.str.len() <= 50, col.str.slice(0, 47) + "..."))
+            parts.extend(("| " + cells.agg(" | ".join, axis=1) + " |\n").tolist())
+
+        parts.append(f"""
 
 **请基于以上完整的数据样本进行分析，考虑：**
 1. 每列的实际内容和数据特征
@@ -1104,9 +1592,9 @@ class TableFileParser(BaseFileParser):
     ...
 }}
 
-只返回JSON，不要其他解释。"""
+只返回JSON，不要其他解释。""")
 
-        return prompt
+        return ''.join(parts)
 
     def _build_column_analysis_prompt_with_sample_data(self, df) -> str:
         """构建列分析提示（基于标题行和前10行数据样本）"""
@@ -1115,18 +1603,21 @@ class TableFileParser(BaseFileParser):
         sample_df = df.head(sample_size)
 
         # 构建数据样本字符串
-        data_sample = "**表格数据样本：**\n"
-        data_sample += "**标题行（列名）：** " + " | ".join(str(col) for col in df.columns) + "\n\n"
-        data_sample += "**前{}行数据：**\n".format(sample_size)
-
-        for idx, row in sample_df.iterrows():
-            row_data = []
-            for col, value in zip(df.columns, row.values):
-                if value is not None and str(value).strip():
-                    row_data.append(f"{col}: {str(value).strip()}")
-                else:
-                    row_data.append(f"{col}: [空]")
-            data_sample += f"第{idx+1}行: {' | '.join(row_data)}\n"
+        sample_parts = [
+            "**表格数据样本：**\n",
+            "**标题行（列名）：** " + " | ".join(str(col) for col in df.columns) + "\n\n",
+            "**前{}行数据：**\n".format(sample_size),
+        ]
+
+        columns = df.columns.tolist()
+        sample_rows = self._prepare_prompt_sample(sample_df).itertuples(index=False, name=None)
+        for idx, row in enumerate(sample_rows):
+            row_data = ' | '.join(
+                f"{col}: {value}" if value else f"{col}: [空]"
+                for col, value in zip(columns, row)
+            )
+            sample_parts.append(f"第{idx+1}行: {row_data}\n")
+        data_sample = ''.join(sample_parts)
 
         prompt = f"""请分析以下Excel表格的列，判断每列应该作为元数据(metadata)还是内容(content)存储到向量数据库中。
 
@@ -1165,14 +1656,18 @@ class TableFileParser(BaseFileParser):
     def _parse_llm_column_response(self, response: str) -> Optional[Dict[str, str]]:
         """解析LLM的列分析响应"""
         try:
-            import json
-            import re
-
-            # 提取JSON部分
-            json_match = re.search(r'\{[^}]+\}', response, re.DOTALL)
-            if json_match:
-                json_str = json_match.group()
-                return json.loads(json_str)
+            # 提取JSON部分：从每个'{'处尝试解码，支持嵌套结构和字符串中的括号
+            decoder = json.JSONDecoder()
+            start = response.find('{')
+            while start >= 0:
+                try:
+                    result, _ = decoder.raw_decode(response, start)
+                except json.JSONDecodeError:
+                    start = response.find('{', start + 1)
+                    continue
+                if isinstance(result, dict):
+                    return result
+                start = response.find('{', start + 1)
 
             return None
 
@@ -1180,84 +1675,108 @@ class TableFileParser(BaseFileParser):
             logger.error(f"解析LLM响应失败: {e}")
             return None
 
+    def _keyword_column_type(self, col) -> Optional[str]:
+        """根据列名关键词判断列类型，未命中任何关键词时返回None"""
+        col_lower = str(col).lower()
+
+        # 优先识别content列（包含丰富文本信息的列）
+        if _CONTENT_COLUMN_RE.search(col_lower):
+            return 'content'
+        # 明确的metadata列：标识/数值、时间、状态分类
+        if (_ID_COLUMN_RE.search(col_lower)
+                or _TIME_COLUMN_RE.search(col_lower)
+                or _STATUS_COLUMN_RE.search(col_lower)):
+            return 'metadata'
+        return None
+
+    def _exact_keyword_column_type(self, col) -> Optional[str]:
+        """按列名中的整词匹配关键词判断列类型，未命中任何关键词时返回None"""
+        tokens = {token.lower() for token in _COLUMN_NAME_TOKEN_RE.findall(str(col))}
+        if not tokens.isdisjoint(_CONTENT_COLUMN_TOKENS):
+            return 'content'
+        if not tokens.isdisjoint(_METADATA_COLUMN_TOKENS):
+            return 'metadata'
+        return None
+
+    def _keyword_column_analysis(self, df) -> Dict[str, str]:
+        """返回列名整词命中关键词规则的列及其类型（未命中的列不包含在结果中）"""
+        column_analysis = {}
+        for col in df.columns:
+            keyword_type = self._exact_keyword_column_type(col)
+            if keyword_type is not None:
+                column_analysis[col] = keyword_type
+        return column_analysis
+
     def _simple_column_analysis(self, df) -> Dict[str, str]:
         """简单的列类型分析（回退方案）"""
+        import pandas as pd
+
         column_analysis = {}
+        undecided_columns = []
 
         for col in df.columns:
-            col_lower = col.lower()
-
-            # 优先识别content列（包含丰富文本信息的列）
-            if any(keyword in col_lower for keyword in [
-                'name', 'title', 'content', 'description', 'text', 'comment', 'summary',
-                '名称', '标题', '内容', '描述', '评论', '摘要', '详情', '说明'
-            ]):
-                column_analysis[col] = 'content'
-            # 明确的metadata列
-            elif any(keyword in col_lower for keyword in [
-                'id', '编号', 'number', 'code', '代码', 'price', '价格', 'amount', '金额',
-                'quantity', '数量', '库存', 'stock', 'count', '计数'
-            ]):
-                column_analysis[col] = 'metadata'
-            elif any(keyword in col_lower for keyword in [
-                'time', 'date', '时间', '日期', 'created', 'updated', '创建', '更新'
-            ]):
-                column_analysis[col] = 'metadata'
-            elif any(keyword in col_lower for keyword in [
-                'status', 'state', '状态', 'type', 'category', '分类', '类型', 'tag', '标签'
-            ]):
-                column_analysis[col] = 'metadata'
+            keyword_type = self._keyword_column_type(col)
+            if keyword_type is not None:
+                column_analysis[col] = keyword_type
             else:
-                # 根据数据内容特征判断
-                if df[col].dtype == 'object':
-                    # 计算平均文本长度
-                    avg_length = df[col].astype(str).str.len().mean()
-                    # 计算唯一值比例
-                    unique_ratio = df[col].nunique() / len(df)
-
-                    # 如果平均长度较长且唯一值比例较高，可能是content
-                    if avg_length > 15 and unique_ratio > 0.5:
-                        column_analysis[col] = 'content'
-                    else:
-                        column_analysis[col] = 'metadata'
-                else:
-                    # 数值类型通常是metadata
-                    column_analysis[col] = 'metadata'
+                # 数值类型通常是metadata，文本列稍后根据数据内容特征判断
+                column_analysis[col] = 'metadata'
+                if pd.api.types.is_string_dtype(df[col].dtype):
+                    undecided_columns.append(col)
+
+        if undecided_columns and len(df) > 0:
+            # 一次性计算所有待判断列的平均文本长度和唯一值比例
+            undecided_df = df[undecided_columns]
+            avg_lengths = undecided_df.astype(str).apply(lambda s: s.str.len().mean())
+            unique_ratios = undecided_df.nunique() / len(df)
+
+            # 如果平均长度较长且唯一值比例较高，可能是content
+            content_mask = (avg_lengths > 15) & (unique_ratios > 0.5)
+            for col in content_mask.index[content_mask.to_numpy()]:
+                column_analysis[col] = 'content'
 
         return column_analysis
 
-    def _convert_table_to_documents(self, table_data: List[Dict], column_analysis: Dict[str, str]) -> List[str]:
-        """将表格数据转换为文档列表"""
-        documents = []
-
-        content_columns = [col for col, type_ in column_analysis.items() if type_ == 'content']
-
-        for row_idx, row in enumerate(table_data):
-            # 提取内容列
-            content_parts = []
-            for col in content_columns:
-                if col in row and row[col] is not None and str(row[col]).strip():
-                    content_parts.append(f"{col}: {str(row[col]).strip()}")
-
-            if content_parts:
-                document = " | ".join(content_parts)
-                documents.append(document)
+    def _convert_dataframe_to_documents(self, df, column_analysis: Dict[str, str]) -> Iterable[str]:
+        """将DataFrame转换为文档序列（按列向量化拼接，每行一个文档）"""
+        content_columns = [col for col, type_ in column_analysis.items()
+                           if type_ == 'content' and col in df.columns]
+
+        documents = self._join_columns_as_text(df, content_columns)
+        if documents is None or documents.isna().any():
+            # 如果没有内容列（或某些行的内容列全为空），将所有列作为内容
+            all_documents = self._join_columns_as_text(df, list(df.columns))
+            documents = all_documents if documents is None else documents.fillna(all_documents)
+
+        if documents is None:
+            return ()
+        # 直接返回Series供"\n\n".join消费，不再复制为列表
+        return documents.dropna()
+
+    def _join_columns_as_text(self, df, columns: List[str]):
+        """将指定列按"列名: 值"格式以" | "拼接，空值跳过；整行无值时结果为NaN"""
+        document = None
+        for col in columns:
+            values = df[col]
+            text = values.astype(str).str.strip()
+            part = (f"{col}: " + text).where(values.notna() & (text != ""))
+            if document is None:
+                document = part
             else:
-                # 如果没有内容列，将所有列作为内容
-                all_parts = []
-                for col, value in row.items():
-                    if value is not None and str(value).strip():
-                        all_parts.append(f"{col}: {str(value).strip()}")
-                if all_parts:
-                    documents.append(" | ".join(all_parts))
-
-        return documents
+                # 两边都有值时拼接，否则取有值的一边
+                document = (document + " | " + part).fillna(document).fillna(part)
+        return document
 
 
 class FileParserManager:
     """文件解析器管理器"""
 
     def __init__(self):
+        # 内容哈希 + 文件格式 -> (解析结果, 估算内存字节数)
+        self._parse_cache: "OrderedDict[Tuple[str, FileFormat], Tuple[ParseResult, int]]" = OrderedDict()
+        self._parse_cache_bytes = 0
+        self._parse_cache_lock = threading.Lock()
+
         self.parsers = [
             TextFileParser(),
             PDFFileParser(),
@@ -1274,27 +1793,28 @@ class FileParserManager:
             for format_ in parser.supported_formats:
                 self.format_parser_map[format_] = parser
 
+        # 解析器注册后不再变化，预先计算支持的格式和扩展名
+        self._supported_formats = tuple(self.format_parser_map.keys())
+        self._supported_extensions = tuple(f".{format_.value}" for format_ in self._supported_formats)
+
     def get_supported_formats(self) -> List[FileFormat]:
         """获取所有支持的文件格式"""
-        return list(self.format_parser_map.keys())
+        return list(self._supported_formats)
 
     def get_supported_extensions(self) -> List[str]:
         """获取所有支持的文件扩展名"""
-        extensions = []
-        for format_ in self.get_supported_formats():
-            extensions.append(f".{format_.value}")
-        return extensions
+        return list(self._supported_extensions)
 
     def can_parse(self, filename: str) -> bool:
         """检查是否支持解析指定文件"""
-        file_format = self._get_file_format(filename)
+        file_format = _get_file_format(filename)
         return file_format in self.format_parser_map
 
     def parse_file(self, file_content: bytes, filename: str) -> ParseResult:
         """解析文件"""
         try:
             # 获取文件格式
-            file_format = self._get_file_format(filename)
+            file_format = _get_file_format(filename)
             if not file_format:
                 return ParseResult(
                     content="",
@@ -1315,9 +1835,30 @@ class FileParserManager:
                     error_message=f"不支持的文件格式: {file_format.value}"
                 )
 
+            # 先检查大小，超限文件不计算哈希也不进入解析器
+            parser._validate_file_size(file_content)
+
+            # 相同内容的文件直接复用缓存的解析结果
+            cache_key = (self._content_hash(file_content), file_format)
+            cached_result = self._get_cached_result(cache_key)
+            if cached_result is not None:
+                logger.info(f"命中解析缓存: {filename}")
+                return cached_result
+
             # 执行解析
-            return parser.parse(file_content, filename)
+            result = parser.parse(file_content, filename)
+            if result.success:
+                self._store_cached_result(cache_key, result)
+            return result
 
+        except FileTooLargeError as e:
+            return ParseResult(
+                content="",
+                metadata={},
+                file_format=file_format,
+                success=False,
+                error_message=str(e)
+            )
         except Exception as e:
             logger.error(f"文件解析失败: {e}")
             return ParseResult(
@@ -1328,29 +1869,42 @@ class FileParserManager:
                 error_message=f"解析失败: {str(e)}"
             )
 
-    def _get_file_format(self, filename: str) -> Optional[FileFormat]:
-        """根据文件名获取文件格式"""
-        if not filename:
-            return None
-
-        extension = filename.lower().split('.')[-1] if '.' in filename else ''
-
-        format_mapping = {
-            'txt': FileFormat.TXT,
-            'pdf': FileFormat.PDF,
-            'docx': FileFormat.DOCX,
-            'doc': FileFormat.DOC,
-            'pptx': FileFormat.PPTX,
-            'ppt': FileFormat.PPT,
-            'md': FileFormat.MARKDOWN,
-            'markdown': FileFormat.MARKDOWN,
-            'rtf': FileFormat.RTF,
-            'xlsx': FileFormat.XLSX,
-            'xls': FileFormat.XLS,
-            'csv': FileFormat.CSV,
-        }
+    def _content_hash(self, file_content: bytes) -> str:
+        """计算文件内容的哈希，作为解析缓存的键"""
+        return _compute_content_digest(file_content)
 
-        return format_mapping.get(extension)
+    def _get_cached_result(self, cache_key: Tuple[str, FileFormat]) -> Optional[ParseResult]:
+        """从LRU缓存获取解析结果（返回副本，避免调用方修改缓存中的数据）"""
+        with self._parse_cache_lock:
+            entry = self._parse_cache.get(cache_key)
+            if entry is None:
+                return None
+            self._parse_cache.move_to_end(cache_key)
+        return _copy_parse_result(entry[0])
+
+    def _store_cached_result(self, cache_key: Tuple[str, FileFormat], result: ParseResult):
+        """写入LRU缓存，超过条目数或内存预算时淘汰最久未使用的条目"""
+        size = _estimate_result_size(result)
+        if size > PARSE_CACHE_MAX_ENTRY_BYTES:
+            return
+
+        cached_result = _copy_parse_result(result)
+        with self._parse_cache_lock:
+            previous = self._parse_cache.pop(cache_key, None)
+            if previous is not None:
+                self._parse_cache_bytes -= previous[1]
+            self._parse_cache[cache_key] = (cached_result, size)
+            self._parse_cache_bytes += size
+            while (len(self._parse_cache) > PARSE_CACHE_MAX_ENTRIES
+                   or self._parse_cache_bytes > PARSE_CACHE_MAX_BYTES):
+                _, (_, evicted_size) = self._parse_cache.popitem(last=False)
+                self._parse_cache_bytes -= evicted_size
+
+    def clear_parse_cache(self):
+        """清空解析结果缓存"""
+        with self._parse_cache_lock:
+            self._parse_cache.clear()
+            self._parse_cache_bytes = 0
 
 
 # 全局文件解析器管理器实例
@@ -4,8 +4,11 @@
 """
 
 import logging
-from typing import List, Dict, Any, Optional
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
 from dataclasses import dataclass
+import numpy as np
 import chromadb
 from chromadb.utils import embedding_functions
 
@@ -13,6 +16,25 @@ from hybrid_retrieval import HierarchicalRetriever, HierarchicalConfig, Hierarch
 
 logger = logging.getLogger(__name__)
 
+# 层次化检索结果缓存的最大查询数（高亮/上下文窗口接口复用最近的检索结果）
+SEARCH_CACHE_MAX_ENTRIES = 32
+
+# 阿里云text-embedding-v4单次请求最多支持的文本数量
+ALIBABA_EMBEDDING_BATCH_SIZE = 10
+# 并发发送的embedding请求数量
+ALIBABA_EMBEDDING_MAX_WORKERS = 4
+
+def _make_chromadb_hit(doc_id: str, doc: str, distance: float, metadata: Optional[Dict]) -> Dict[str, Any]:
+    """构建单条ChromaDB检索结果"""
+    return {
+        "id": doc_id,
+        "content": doc,
+        "score": 1 - distance,  # 转换为相似度分数
+        "distance": distance,
+        "metadata": metadata or {},
+        "type": "chromadb"
+    }
+
 @dataclass
 class RAGConfig:
     """RAG配置"""
@@ -36,6 +58,8 @@ class HierarchicalRAGManager:
         self.collection = None
         self.hierarchical_retriever = None
         self.embedding_function = None
+        # 查询 -> (检索结果列表, 子chunk ID -> 检索结果)，按最近使用排序
+        self._search_cache: "OrderedDict[str, Tuple[List[HierarchicalResult], Dict[str, HierarchicalResult]]]" = OrderedDict()
         
     def initialize(self, chroma_client, collection_name: str):
         """初始化RAG系统"""
@@ -56,11 +80,32 @@ class HierarchicalRAGManager:
             # 这里应该使用与ChromaDB相同的embedding函数
             # 实际实现时需要根据具体的embedding模型调整
             if self.config.embedding_model == "alibaba-text-embedding-v4":
-                # 模拟阿里云embedding函数
-                def alibaba_embedding(texts):
-                    # 实际实现时替换为真实的阿里云API调用
-                    import numpy as np
-                    return [np.random.rand(1024) for _ in texts]
+                from alibaba_embedding import AlibabaDashScopeEmbeddingFunction
+
+                alibaba_function = AlibabaDashScopeEmbeddingFunction(model_name="text-embedding-v4")
+
+                def alibaba_embedding(texts: List[str]) -> np.ndarray:
+                    """按API限制分批并发请求，返回形状为(len(texts), 维度)的float32矩阵"""
+                    texts = list(texts)
+                    if not texts:
+                        return np.empty((0, alibaba_function.dimension), dtype=np.float32)
+
+                    batches = [
+                        texts[i:i + ALIBABA_EMBEDDING_BATCH_SIZE]
+                        for i in range(0, len(texts), ALIBABA_EMBEDDING_BATCH_SIZE)
+                    ]
+                    if len(batches) == 1:
+                        return np.asarray(alibaba_function(batches[0]), dtype=np.float32)
+
+                    with ThreadPoolExecutor(max_workers=min(ALIBABA_EMBEDDING_MAX_WORKERS, len(batches))) as executor:
+                        batch_embeddings = list(executor.map(alibaba_function, batches))
+                    return np.asarray(
+                        [embedding for batch in batch_embeddings for embedding in batch],
+                        dtype=np.float32
+                    )
+                # 标明模型和维度，层次化检索器据此判断缓存的向量是否可以复用
+                alibaba_embedding.model_name = alibaba_function.model_name
+                alibaba_embedding.dimension = alibaba_function.dimension
                 return alibaba_embedding
             else:
                 # 使用ChromaDB默认embedding
@@ -81,6 +126,8 @@ class HierarchicalRAGManager:
         if self.config.enable_hierarchical and self.hierarchical_retriever:
             try:
                 self.hierarchical_retriever.fit(documents, self.embedding_function)
+                # 检索器重新训练后，缓存的检索结果失效
+                self._search_cache.clear()
                 logger.info(f"层次化检索器训练完成，文档数量: {len(documents)}")
             except Exception as e:
                 logger.error(f"层次化检索器训练失败: {e}")
@@ -110,7 +157,7 @@ class HierarchicalRAGManager:
         # 1. 尝试层次化检索
         if self.config.enable_hierarchical and self.hierarchical_retriever:
             try:
-                hierarchical_results = self.hierarchical_retriever.search(query)
+                hierarchical_results = self._search_hierarchical(query)[0]
                 results["hierarchical_results"] = self._format_hierarchical_results(hierarchical_results)
                 results["method"] = "hierarchical"
                 logger.info(f"层次化检索返回 {len(hierarchical_results)} 个结果")
@@ -138,6 +185,22 @@ class HierarchicalRAGManager:
         
         return results
     
+    def _search_hierarchical(self, query: str) -> Tuple[List[HierarchicalResult], Dict[str, HierarchicalResult]]:
+        """执行层次化检索，优先复用缓存的结果"""
+        cached = self._search_cache.get(query)
+        if cached is not None:
+            self._search_cache.move_to_end(query)
+            return cached
+        
+        hierarchical_results = self.hierarchical_retriever.search(query)
+        results_by_id = {result.child_chunk_id: result for result in hierarchical_results}
+        cached = (hierarchical_results, results_by_id)
+        
+        self._search_cache[query] = cached
+        while len(self._search_cache) > SEARCH_CACHE_MAX_ENTRIES:
+            self._search_cache.popitem(last=False)
+        return cached
+    
     def _format_hierarchical_results(self, results: List[HierarchicalResult]) -> List[Dict]:
         """格式化层次化检索结果"""
         formatted_results = []
@@ -166,38 +229,23 @@ class HierarchicalRAGManager:
     
     def _format_chromadb_results(self, results: Dict) -> List[Dict]:
         """格式化ChromaDB检索结果"""
-        formatted_results = []
-        
         documents = results.get('documents', [[]])[0]
         distances = results.get('distances', [[]])[0]
         metadatas = results.get('metadatas', [[]])[0]
         ids = results.get('ids', [[]])[0]
         
-        for i, (doc, distance, metadata, doc_id) in enumerate(zip(documents, distances, metadatas, ids)):
-            formatted_result = {
-                "id": doc_id,
-                "content": doc,
-                "score": 1 - distance,  # 转换为相似度分数
-                "distance": distance,
-                "metadata": metadata or {},
-                "type": "chromadb"
-            }
-            formatted_results.append(formatted_result)
-        
-        return formatted_results
+        return list(map(_make_chromadb_hit, ids, documents, distances, metadatas))
     
     def get_highlighted_result(self, result_id: str, query: str) -> Optional[str]:
         """获取带高亮的结果"""
         if not self.hierarchical_retriever:
             return None
         
-        # 查找对应的层次化结果
-        # 这里需要实现结果缓存机制，简化示例
+        # 查找对应的层次化结果（复用search缓存的检索结果）
         try:
-            results = self.hierarchical_retriever.search(query)
-            for result in results:
-                if result.child_chunk_id == result_id:
-                    return self.hierarchical_retriever.get_highlighted_content(result, query)
+            result = self._search_hierarchical(query)[1].get(result_id)
+            if result is not None:
+                return self.hierarchical_retriever.get_highlighted_content(result, query)
         except Exception as e:
             logger.error(f"获取高亮结果失败: {e}")
         
@@ -209,10 +257,9 @@ class HierarchicalRAGManager:
             return None
         
         try:
-            results = self.hierarchical_retriever.search(query)
-            for result in results:
-                if result.child_chunk_id == result_id:
-                    return self.hierarchical_retriever.get_context_window(result, window_size)
+            result = self._search_hierarchical(query)[1].get(result_id)
+            if result is not None:
+                return self.hierarchical_retriever.get_context_window(result, window_size)
         except Exception as e:
             logger.error(f"获取上下文窗口失败: {e}")
         
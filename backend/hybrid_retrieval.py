@@ -3,18 +3,98 @@
 解决大chunk与短查询的语义匹配问题，通过子chunk检索和父chunk上下文返回
 """
 
+import hashlib
 import logging
+import os
+import pickle
 import re
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any, Tuple, Optional
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import jieba
-import jieba.analyse
+from scipy import sparse
+
+# 可选：jieba_fast（jieba的C扩展实现，接口一致，分词更快）
+try:
+    import jieba_fast as jieba
+    import jieba_fast.analyse
+except ImportError:
+    import jieba
+    import jieba.analyse
 
 logger = logging.getLogger(__name__)
 
+# 智能边界检测：句子边界字符，以及句子/词语边界字符的匹配模式
+_SENTENCE_BOUNDARY_CHARS = '。！？.!?'
+_BOUNDARY_CHAR_RE = re.compile(r'[。！？.!? \n\t，,；;]')
+
+# BM25有效词：至少两个字母/数字字符（与str.isalnum()一致，不含下划线、空白和标点）
+_BM25_TOKEN_RE = re.compile(r'[^\W_]{2,}')
+
+# embedding请求失败重试的初始退避时间（秒），每次重试翻倍
+EMBEDDING_RETRY_BACKOFF_SECONDS = 0.5
+# 无法从embedding结果推断维度时使用的默认向量维度
+DEFAULT_EMBEDDING_DIMENSION = 1024
+# 查询向量缓存的最大条目数（命中时跳过embedding接口调用）
+QUERY_EMBEDDING_CACHE_MAX_ENTRIES = 512
+# 查询扩展结果缓存的最大查询数
+QUERY_EXPANSION_CACHE_MAX_ENTRIES = 1024
+# 训练结果缓存格式版本（分块数据结构变化时递增，使旧缓存失效）
+FIT_CACHE_FORMAT_VERSION = 2
+
+
+def _min_max_normalize(scores: np.ndarray) -> np.ndarray:
+    """min-max归一化到[0, 1]；所有分数相同时，正分数视为1，其余视为0；-inf等非有限分数不参与归一化，视为0"""
+    if scores.size == 0:
+        return scores
+    finite = np.isfinite(scores)
+    if not finite.all():
+        normalized = np.zeros_like(scores)
+        normalized[finite] = _min_max_normalize(scores[finite])
+        return normalized
+    score_range = float(scores.max() - scores.min())
+    if score_range <= 1e-9:
+        return (scores > 0).astype(scores.dtype)
+    return (scores - scores.min()) / score_range
+
+
+def _top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """返回分数最高的k个下标（按分数降序，同分时按下标升序），k小于总数时使用argpartition"""
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < scores.size:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+        return candidates[np.lexsort((candidates, -scores[candidates]))]
+    return np.argsort(-scores, kind='stable')
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """按行L2归一化（零向量保持为零）"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _embedding_function_identity(embedding_function) -> Optional[Tuple[str, Optional[str], Optional[int]]]:
+    """embedding函数的标识：(函数名, 模型名, 向量维度)，模型或维度变化后缓存的向量不能复用"""
+    if embedding_function is None:
+        return None
+    return (
+        getattr(embedding_function, '__qualname__', type(embedding_function).__qualname__),
+        getattr(embedding_function, 'model_name', None),
+        getattr(embedding_function, 'dimension', None),
+    )
+
+
+def _quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """按行对称量化为int8，返回(int8矩阵, 每行float32缩放系数)"""
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    quantized = np.round(vectors / scales[:, None]).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
 @dataclass
 class ChunkPosition:
     """chunk位置信息"""
@@ -29,8 +109,10 @@ class ChildChunk:
     id: str
     content: str
     parent_id: str
+    parent_chunk_index: int                 # 所属父chunk在父chunk列表中的下标
     position: ChunkPosition
     embedding: Optional[np.ndarray] = None
+    tokens: Optional[List[str]] = None      # 小写内容的分词结果（训练时计算一次）
 
 @dataclass
 class ParentChunk:
@@ -78,6 +160,16 @@ class HierarchicalConfig:
     query_expansion: bool = True       # 是否启用查询扩展
     smart_boundary: bool = True        # 是否启用智能边界检测
     context_expansion: bool = True     # 是否启用上下文扩展
+    quantize_embeddings: bool = True   # 语义检索使用int8量化向量计算相似度
+    half_precision_embeddings: bool = True  # 未启用量化时以float16存储归一化向量
+
+    # 子chunk向量生成配置
+    embedding_batch_size: int = 64     # 单次调用embedding函数的文本数量
+    embedding_max_workers: int = 4     # 并发调用embedding函数的线程数
+    embedding_max_retries: int = 2     # 单个批次失败后的重试次数
+
+    # 训练结果缓存目录（为None时不落盘，仅跳过相同文档集的重复训练）
+    cache_dir: Optional[str] = None
 
     # 智能粒度匹配配置
     enable_intelligent_granularity: bool = True  # 启用智能粒度匹配
@@ -130,6 +222,7 @@ class HierarchicalChunker:
                 child_chunk_data = self._split_to_child_chunks(parent_text, parent_id)
 
                 # 创建父chunk
+                parent_chunk_index = len(parent_chunks)
                 child_ids = [child['id'] for child in child_chunk_data]
                 parent_chunk = ParentChunk(
                     id=parent_id,
@@ -145,6 +238,7 @@ class HierarchicalChunker:
                         id=child_data['id'],
                         content=child_data['content'],
                         parent_id=parent_id,
+                        parent_chunk_index=parent_chunk_index,
                         position=child_data['position']
                     )
                     child_chunks.append(child_chunk)
@@ -233,99 +327,143 @@ class HierarchicalChunker:
 
         # 在end位置前后寻找最佳分割点
         search_range = min(50, (end - start) // 4)  # 搜索范围
-        best_pos = end
+        window_start = max(start + 1, end - search_range + 1)
+        if window_start > end:
+            return end
 
         # 优先级：段落 > 句子 > 词语边界
-        for offset in range(search_range):
-            # 向前搜索
-            pos = end - offset
-            if pos > start:
-                if text[pos:pos+2] == '\n\n':  # 段落边界
-                    return pos + 2
-                elif text[pos] in '。！？.!?':  # 句子边界
-                    best_pos = pos + 1
-                elif text[pos] in ' \n\t，,；;':  # 词语边界
-                    if best_pos == end:  # 只有没找到更好的才用词语边界
-                        best_pos = pos + 1
+        paragraph_pos = text.rfind('\n\n', window_start, end + 2)
+        if paragraph_pos >= 0:  # 段落边界（取最靠后的一个）
+            return paragraph_pos + 2
+
+        # 由正则一次找出窗口内所有候选分割点，再从后向前确定分割位置
+        best_pos = end
+        for match in reversed(list(_BOUNDARY_CHAR_RE.finditer(text, window_start, end + 1))):
+            pos = match.start()
+            if text[pos] in _SENTENCE_BOUNDARY_CHARS:  # 句子边界
+                best_pos = pos + 1
+            elif best_pos == end:  # 词语边界：只有没找到更好的才用
+                best_pos = pos + 1
 
         return best_pos
 
 
 class BM25Retriever:
-    """BM25检索器"""
+    """BM25检索器（词频以稀疏矩阵存储，检索时向量化计算）"""
     
     def __init__(self, k1: float = 1.5, b: float = 0.75):
         self.k1 = k1
         self.b = b
         self.documents = []
-        self.doc_lengths = []
+        self.doc_lengths = np.zeros(0, dtype=np.float32)
         self.avg_doc_length = 0
-        self.term_frequencies = []
-        self.document_frequencies = {}
-        self.vocabulary = set()
+        self.vocabulary: Dict[str, int] = {}
+        # 词频矩阵（行=文档，列=词），按列压缩便于按查询词取列
+        self.tf_matrix: Optional[sparse.csc_matrix] = None
+        # 预先计算的BM25词项权重矩阵（与词频矩阵结构相同）。按列压缩存储即倒排索引：
+        # 第c列的 indices[indptr[c]:indptr[c+1]] 为包含该词的文档，data为对应的BM25权重
+        self.weight_matrix: Optional[sparse.csc_matrix] = None
+        self.idf = np.zeros(0, dtype=np.float32)
+        # 每个文档的长度归一化项 k1 * (1 - b + b * 文档长度 / 平均长度)
+        self.length_norm = np.zeros(0, dtype=np.float32)
         
     def fit(self, documents: List[str]):
         """训练BM25模型"""
         self.documents = documents
-        self.doc_lengths = []
-        self.term_frequencies = []
-        self.document_frequencies = {}
-        self.vocabulary = set()
+        self.vocabulary = {}
+        
+        rows, cols, counts = [], [], []
+        doc_lengths = []
         
         # 分词和统计
-        for doc in documents:
+        for doc_idx, doc in enumerate(documents):
             tokens = self._tokenize(doc)
-            self.doc_lengths.append(len(tokens))
+            doc_lengths.append(len(tokens))
             
             # 计算词频
-            tf = {}
-            for token in tokens:
-                tf[token] = tf.get(token, 0) + 1
-                self.vocabulary.add(token)
-            self.term_frequencies.append(tf)
-            
-            # 计算文档频率
-            unique_tokens = set(tokens)
-            for token in unique_tokens:
-                self.document_frequencies[token] = self.document_frequencies.get(token, 0) + 1
+            tf = Counter(tokens)
+            rows.extend([doc_idx] * len(tf))
+            cols.extend([self.vocabulary.setdefault(token, len(self.vocabulary)) for token in tf])
+            counts.extend(tf.values())
+        
+        doc_count = len(documents)
+        self.tf_matrix = sparse.csc_matrix(
+            (np.asarray(counts, dtype=np.float32), (rows, cols)),
+            shape=(doc_count, len(self.vocabulary))
+        )
+        
+        # 文档频率 = 每列非零元素个数
+        document_frequencies = np.diff(self.tf_matrix.indptr).astype(np.float32)
+        self.idf = np.log((doc_count - document_frequencies + 0.5) / (document_frequencies + 0.5)).astype(np.float32)
+        
+        self.doc_lengths = np.asarray(doc_lengths, dtype=np.float32)
+        self.avg_doc_length = float(self.doc_lengths.mean()) if doc_count else 0.0
+        relative_lengths = self.doc_lengths / self.avg_doc_length if self.avg_doc_length > 0 else self.doc_lengths
+        self.length_norm = (self.k1 * (1 - self.b + self.b * relative_lengths)).astype(np.float32)
         
-        self.avg_doc_length = sum(self.doc_lengths) / len(self.doc_lengths)
-        logger.info(f"BM25模型训练完成，文档数量: {len(documents)}, 词汇量: {len(self.vocabulary)}")
+        # 对每个非零词频预先计算 idf * tf * (k1 + 1) / (tf + 长度归一化项)
+        tf = self.tf_matrix.data
+        term_cols = np.repeat(np.arange(len(self.vocabulary)), np.diff(self.tf_matrix.indptr))
+        weights = self.idf[term_cols] * tf * (self.k1 + 1) / (tf + self.length_norm[self.tf_matrix.indices])
+        self.weight_matrix = sparse.csc_matrix(
+            (weights.astype(np.float32), self.tf_matrix.indices, self.tf_matrix.indptr),
+            shape=self.tf_matrix.shape
+        )
+        
+        logger.info(f"BM25模型训练完成，文档数量: {doc_count}, 词汇量: {len(self.vocabulary)}")
     
     def _tokenize(self, text: str) -> List[str]:
         """分词"""
         # 中文分词
         tokens = jieba.lcut(text)
         # 过滤停用词和标点
-        tokens = [token.strip() for token in tokens if len(token.strip()) > 1 and token.isalnum()]
-        return tokens
+        is_valid_token = _BM25_TOKEN_RE.fullmatch
+        return [token for token in tokens if is_valid_token(token)]
     
     def search(self, query: str, top_k: int = 10) -> List[Tuple[int, float]]:
         """BM25检索"""
-        query_tokens = self._tokenize(query)
-        scores = []
+        doc_count = len(self.documents)
+        if doc_count == 0 or top_k <= 0:
+            return []
         
-        for doc_idx, tf in enumerate(self.term_frequencies):
-            score = 0
-            doc_length = self.doc_lengths[doc_idx]
-            
-            for token in query_tokens:
-                if token in tf:
-                    # BM25公式
-                    tf_score = tf[token]
-                    df = self.document_frequencies.get(token, 0)
-                    idf = np.log((len(self.documents) - df + 0.5) / (df + 0.5))
-                    
-                    numerator = tf_score * (self.k1 + 1)
-                    denominator = tf_score + self.k1 * (1 - self.b + self.b * doc_length / self.avg_doc_length)
-                    
-                    score += idf * numerator / denominator
+        scores = self.get_scores(query)
+        
+        # 排序并返回top_k（同分时按文档顺序）
+        return [(int(doc_idx), float(scores[doc_idx])) for doc_idx in _top_k_indices(scores, top_k)]
+    
+    def get_scores(self, query: str) -> np.ndarray:
+        """计算查询对所有文档的BM25分数（按文档顺序）"""
+        doc_count = len(self.documents)
+        scores = np.zeros(doc_count, dtype=np.float32)
+        if doc_count == 0:
+            return scores
+        
+        # 查询词去重后映射为列索引（忽略词表外的词，重复的查询词按次数加权）
+        vocabulary = self.vocabulary
+        query_counts = {
+            vocabulary[token]: count
+            for token, count in Counter(self._tokenize(query)).items()
+            if token in vocabulary
+        }
+        
+        if query_counts:
+            cols = np.fromiter(query_counts.keys(), dtype=np.int64, count=len(query_counts))
+            counts = np.fromiter(query_counts.values(), dtype=np.float32, count=len(query_counts))
             
-            scores.append((doc_idx, score))
+            # 拼接各查询词的倒排列表，只访问包含查询词的文档，按文档累加权重 * 查询词次数
+            indptr = self.weight_matrix.indptr
+            starts = indptr[cols]
+            lengths = indptr[cols + 1] - starts
+            total = int(lengths.sum())
+            if total:
+                segment_offsets = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+                postings = segment_offsets + np.arange(total)
+                contributions = self.weight_matrix.data[postings] * np.repeat(counts, lengths)
+                scores = np.bincount(
+                    self.weight_matrix.indices[postings], weights=contributions, minlength=doc_count
+                ).astype(np.float32)
         
-        # 排序并返回top_k
-        scores.sort(key=lambda x: x[1], reverse=True)
-        return scores[:top_k]
+        return scores
 
 class QueryExpander:
     """查询扩展器"""
@@ -337,9 +475,20 @@ class QueryExpander:
             "算法": ["模型", "方法", "技术"],
             "数据": ["信息", "资料", "内容"],
         }
+        # 查询文本 -> 扩展后的查询，按最近使用排序（同义词词典修改后需调用clear_cache）
+        self._expansion_cache: "OrderedDict[str, str]" = OrderedDict()
+    
+    def clear_cache(self):
+        """清空查询扩展缓存"""
+        self._expansion_cache.clear()
     
     def expand_query(self, query: str) -> str:
-        """扩展查询"""
+        """扩展查询，相同查询复用LRU缓存中的结果"""
+        expanded_query = self._expansion_cache.get(query)
+        if expanded_query is not None:
+            self._expansion_cache.move_to_end(query)
+            return expanded_query
+        
         # 提取关键词
         keywords = jieba.analyse.extract_tags(query, topK=5)
         
@@ -355,6 +504,9 @@ class QueryExpander:
         expanded_query = " ".join(unique_terms)
         
         logger.info(f"查询扩展: '{query}' -> '{expanded_query}'")
+        self._expansion_cache[query] = expanded_query
+        while len(self._expansion_cache) > QUERY_EXPANSION_CACHE_MAX_ENTRIES:
+            self._expansion_cache.popitem(last=False)
         return expanded_query
 
 class HierarchicalRetriever:
@@ -370,61 +522,244 @@ class HierarchicalRetriever:
         self.parent_chunks: List[ParentChunk] = []
         self.child_chunks: List[ChildChunk] = []
         self.child_embeddings: Optional[np.ndarray] = None
+        # 归一化后int8量化的子chunk向量及每行缩放系数（用于语义检索）
+        self.child_embeddings_int8: Optional[np.ndarray] = None
+        self.child_embedding_scales: Optional[np.ndarray] = None
+        # 未启用量化时使用的归一化子chunk向量（float16或float32）
+        self.child_embeddings_normalized: Optional[np.ndarray] = None
+        # embedding生成失败（以零向量占位）的子chunk掩码，这些子chunk不参与语义打分
+        self.child_embedding_failed: Optional[np.ndarray] = None
         self.embedding_function = None
+        # 查询文本 -> 查询向量（float32，形状为(1, 维度)），按最近使用排序
+        self._query_embedding_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        # 当前训练结果对应的文档集指纹
+        self._fit_fingerprint: Optional[str] = None
 
         # 索引映射
         self.child_id_to_index = {}
         self.parent_id_to_chunk = {}
+        # 按子chunk下标排列的所属父chunk下标、起始位置及所属父chunk长度（检索时向量化计算）
+        self.child_to_parent_idx = np.empty(0, dtype=np.int64)
+        self.child_start_char = np.empty(0, dtype=np.int32)
+        self.parent_len_for_child = np.empty(0, dtype=np.int32)
 
     def fit(self, documents: List[str], embedding_function):
         """训练层次化检索模型"""
+        fingerprint = self._compute_fit_fingerprint(documents, embedding_function)
+        if fingerprint == self._fit_fingerprint and embedding_function is self.embedding_function:
+            logger.info("文档集未变化，跳过层次化检索模型训练")
+            return
+
+        if embedding_function is not self.embedding_function:
+            # embedding函数变化后，缓存的查询向量不再可用
+            self._query_embedding_cache.clear()
         self.embedding_function = embedding_function
 
+        if self._load_fit_cache(fingerprint):
+            self._fit_fingerprint = fingerprint
+            logger.info(f"从缓存加载层次化检索模型: {len(self.parent_chunks)}个父chunk, {len(self.child_chunks)}个子chunk")
+            return
+
         # 1. 层次化分块
         self.parent_chunks, self.child_chunks = self.chunker.split_documents(documents)
 
         # 2. 建立索引映射
         self._build_indices()
 
+        # 子chunk内容固定，训练时分词一次，供排序阶段复用
+        for chunk in self.child_chunks:
+            chunk.tokens = jieba.lcut(chunk.content.lower())
+
         # 3. 生成子chunk的embedding
-        self._generate_child_embeddings()
+        embeddings_complete = self._generate_child_embeddings()
 
         # 4. 训练BM25（基于子chunk）
         child_contents = [chunk.content for chunk in self.child_chunks]
         self.bm25_retriever.fit(child_contents)
 
+        if embeddings_complete:
+            self._fit_fingerprint = fingerprint
+            self._save_fit_cache(fingerprint)
+        else:
+            # 部分批次embedding失败时不记录指纹也不写缓存，下次训练重新生成向量
+            self._fit_fingerprint = None
+
         logger.info(f"层次化检索模型训练完成: {len(self.parent_chunks)}个父chunk, {len(self.child_chunks)}个子chunk")
 
-    def _build_indices(self):
-        """建立索引映射"""
-        for idx, child_chunk in enumerate(self.child_chunks):
-            self.child_id_to_index[child_chunk.id] = idx
+    def _compute_fit_fingerprint(self, documents: List[str], embedding_function) -> str:
+        """计算文档集和分块配置的指纹，作为训练结果的缓存键"""
+        digest = hashlib.sha256()
+        for document in documents:
+            digest.update(document.encode('utf-8'))
+            digest.update(b'\0')
+
+        config = self.config
+        digest.update(repr((
+            FIT_CACHE_FORMAT_VERSION,
+            jieba.__name__,  # 不同分词实现的结果可能不同，缓存的分词和BM25状态不能混用
+            config.parent_chunk_size,
+            config.child_chunk_size,
+            config.overlap_size,
+            config.smart_boundary,
+            config.quantize_embeddings,
+            config.half_precision_embeddings,
+            _embedding_function_identity(embedding_function),
+        )).encode('utf-8'))
+        return digest.hexdigest()
+
+    def _fit_cache_paths(self, fingerprint: str) -> Tuple[str, str]:
+        """训练结果缓存文件路径：(分块和BM25状态, 子chunk向量)"""
+        base_path = os.path.join(self.config.cache_dir, fingerprint)
+        return base_path + '.pkl', base_path + '.npy'
+
+    def _load_fit_cache(self, fingerprint: str) -> bool:
+        """从缓存目录加载训练结果，成功时返回True"""
+        if not self.config.cache_dir:
+            return False
+
+        state_path, embeddings_path = self._fit_cache_paths(fingerprint)
+        if not os.path.exists(state_path):
+            return False
 
-        for parent_chunk in self.parent_chunks:
-            self.parent_id_to_chunk[parent_chunk.id] = parent_chunk
+        try:
+            with open(state_path, 'rb') as f:
+                state = pickle.load(f)
+
+            self.parent_chunks = state['parent_chunks']
+            self.child_chunks = state['child_chunks']
+            self.bm25_retriever = state['bm25_retriever']
+            self._build_indices()
+
+            self.child_embeddings = None
+            self.child_embedding_failed = None
+            if self.embedding_function:
+                if not os.path.exists(embeddings_path):
+                    # 缓存中没有向量文件，按缓存不完整处理，重新训练
+                    return False
+                # 向量文件以内存映射方式打开，冷启动时不需要重新调用embedding接口
+                self.child_embeddings = np.load(embeddings_path, mmap_mode='r')
+                self._prepare_search_embeddings()
+            return True
+        except Exception as e:
+            logger.warning(f"加载层次化检索缓存失败，重新训练: {e}")
+            return False
 
-    def _generate_child_embeddings(self):
-        """生成子chunk的embedding"""
-        if not self.embedding_function:
+    def _save_fit_cache(self, fingerprint: str):
+        """将训练结果写入缓存目录（先写临时文件再替换，避免读到不完整的缓存）"""
+        if not self.config.cache_dir:
             return
 
+        state_path, embeddings_path = self._fit_cache_paths(fingerprint)
+        try:
+            os.makedirs(self.config.cache_dir, exist_ok=True)
+
+            if self.child_embeddings is not None:
+                with open(embeddings_path + '.tmp', 'wb') as f:
+                    np.save(f, self.child_embeddings)
+                os.replace(embeddings_path + '.tmp', embeddings_path)
+
+            # 向量单独存储，分块状态中不重复保存
+            state = {
+                'parent_chunks': self.parent_chunks,
+                'child_chunks': [replace(chunk, embedding=None) for chunk in self.child_chunks],
+                'bm25_retriever': self.bm25_retriever,
+            }
+            with open(state_path + '.tmp', 'wb') as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(state_path + '.tmp', state_path)
+        except Exception as e:
+            logger.warning(f"保存层次化检索缓存失败: {e}")
+
+    def _build_indices(self):
+        """建立索引映射"""
+        self.child_id_to_index = {child_chunk.id: idx for idx, child_chunk in enumerate(self.child_chunks)}
+        self.parent_id_to_chunk = {parent_chunk.id: parent_chunk for parent_chunk in self.parent_chunks}
+
+        child_count = len(self.child_chunks)
+        self.child_to_parent_idx = np.fromiter(
+            (child_chunk.parent_chunk_index for child_chunk in self.child_chunks),
+            dtype=np.int64, count=child_count
+        )
+        self.child_start_char = np.fromiter(
+            (child_chunk.position.start_char for child_chunk in self.child_chunks),
+            dtype=np.int32, count=child_count
+        )
+        parent_lengths = np.fromiter(
+            (len(parent_chunk.content) for parent_chunk in self.parent_chunks),
+            dtype=np.int32, count=len(self.parent_chunks)
+        )
+        self.parent_len_for_child = parent_lengths[self.child_to_parent_idx]
+
+    def _generate_child_embeddings(self) -> bool:
+        """生成子chunk的embedding，所有批次都成功时返回True"""
+        if not self.embedding_function:
+            return True
+
         child_contents = [chunk.content for chunk in self.child_chunks]
+        batch_size = max(1, self.config.embedding_batch_size)
+        batches = [child_contents[i:i + batch_size] for i in range(0, len(child_contents), batch_size)]
 
-        # 批量生成embedding（考虑API限制）
-        batch_size = 10
-        all_embeddings = []
+        # 批量并发生成embedding（结果按批次顺序返回），统一为连续的float32二维矩阵，便于整体计算相似度
+        if len(batches) > 1 and self.config.embedding_max_workers > 1:
+            with ThreadPoolExecutor(max_workers=min(self.config.embedding_max_workers, len(batches))) as executor:
+                batch_embeddings = list(executor.map(self._embed_batch, batches))
+        else:
+            batch_embeddings = [self._embed_batch(batch) for batch in batches]
+
+        # 使用零向量作为fallback（维度与成功的批次保持一致）
+        dimension = next(
+            (embeddings.shape[1] for embeddings in batch_embeddings if embeddings is not None),
+            DEFAULT_EMBEDDING_DIMENSION
+        )
+        # 失败批次以零向量占位保持行对齐，并记录失败行，检索时排除在语义打分之外
+        failed_rows = np.zeros(len(child_contents), dtype=bool)
+        for batch_idx, embeddings in enumerate(batch_embeddings):
+            if embeddings is None:
+                failed_rows[batch_idx * batch_size:(batch_idx + 1) * batch_size] = True
+                batch_embeddings[batch_idx] = np.zeros((len(batches[batch_idx]), dimension), dtype=np.float32)
+
+        failed_count = int(failed_rows.sum())
+        self.child_embedding_failed = failed_rows if failed_count else None
+        if failed_count:
+            logger.warning(f"{failed_count}/{len(child_contents)}个子chunk的embedding生成失败，这些子chunk不参与语义检索")
+
+        if batch_embeddings:
+            self.child_embeddings = np.ascontiguousarray(np.vstack(batch_embeddings))
+        else:
+            self.child_embeddings = np.empty((0, dimension), dtype=np.float32)
+
+        self._prepare_search_embeddings()
+        return failed_count == 0
 
-        for i in range(0, len(child_contents), batch_size):
-            batch = child_contents[i:i + batch_size]
+    def _embed_batch(self, batch: List[str]) -> Optional[np.ndarray]:
+        """生成一个批次的embedding，失败时按指数退避重试，仍失败返回None"""
+        for attempt in range(self.config.embedding_max_retries + 1):
             try:
-                batch_embeddings = self.embedding_function(batch)
-                all_embeddings.extend(batch_embeddings)
+                embeddings = np.asarray(self.embedding_function(batch), dtype=np.float32)
+                return embeddings.reshape(len(batch), -1)
             except Exception as e:
-                logger.error(f"生成embedding失败: {e}")
-                # 使用零向量作为fallback
-                all_embeddings.extend([np.zeros(1024) for _ in batch])
-
-        self.child_embeddings = np.array(all_embeddings)
+                if attempt < self.config.embedding_max_retries:
+                    delay = EMBEDDING_RETRY_BACKOFF_SECONDS * (2 ** attempt)
+                    logger.warning(f"生成embedding失败，{delay}秒后重试: {e}")
+                    time.sleep(delay)
+                else:
+                    # 失败行数由调用方汇总告警
+                    logger.debug(f"生成embedding失败: {e}")
+        return None
+
+    def _prepare_search_embeddings(self):
+        """根据子chunk向量准备检索用的归一化/量化向量"""
+        # 余弦相似度 = 归一化向量的点积，训练时归一化一次，检索时只需归一化查询向量
+        normalized_embeddings = _normalize_rows(self.child_embeddings)
+        if self.config.quantize_embeddings:
+            # 量化后检索时扫描的数据量减少为1/4
+            self.child_embeddings_int8, self.child_embedding_scales = _quantize_int8(normalized_embeddings)
+            self.child_embeddings_normalized = None
+        else:
+            self.child_embeddings_int8, self.child_embedding_scales = None, None
+            # float16存储使每次检索扫描的数据量减半
+            storage_dtype = np.float16 if self.config.half_precision_embeddings else np.float32
+            self.child_embeddings_normalized = np.ascontiguousarray(normalized_embeddings, dtype=storage_dtype)
 
         # 存储到子chunk对象中
         for i, chunk in enumerate(self.child_chunks):
@@ -470,199 +805,239 @@ class HierarchicalRetriever:
             expanded_query = query
 
         # 第一级：子chunk级别的混合检索
-        child_results = self._search_child_chunks(query, expanded_query)
+        child_candidates = self._search_child_chunks(query, expanded_query)
 
         # 第二级：父chunk级别的聚合和重排序（应用智能粒度权重）
-        hierarchical_results = self._aggregate_to_parent_level(child_results, granularity_weights)
+        child_candidates = self._aggregate_to_parent_level(child_candidates, granularity_weights)
 
-        # 第三级：基于位置和语义连贯性的最终排序
-        final_results = self._final_ranking(query, hierarchical_results, query_type)
+        # 第三级：基于位置和语义连贯性的最终排序，只为最终的top_k构建结果对象
+        final_results = self._final_ranking(query, child_candidates, query_type, top_k=self.config.top_k,
+                                            granularity_weights=granularity_weights)
 
         logger.info(f"智能粒度匹配检索完成: 查询类型={query_type}, 返回结果数={len(final_results)}")
-        return final_results[:self.config.top_k]
-
-    def _search_child_chunks(self, original_query: str, expanded_query: str) -> List[Dict]:
-        """在子chunk级别进行混合检索"""
-        # 1. 语义检索
-        semantic_scores = self._semantic_search_children(original_query)
-
-        # 2. BM25检索
-        bm25_scores = self._bm25_search_children(expanded_query)
-
-        # 3. 融合分数
-        child_results = []
-        for i, child_chunk in enumerate(self.child_chunks):
-            semantic_score = semantic_scores.get(i, 0.0)
-            bm25_score = bm25_scores.get(i, 0.0)
-
-            # 加权融合
-            hybrid_score = (self.config.semantic_weight * semantic_score +
-                          self.config.bm25_weight * bm25_score)
-
-            if hybrid_score >= self.config.min_score_threshold:
-                child_results.append({
-                    'child_index': i,
-                    'child_chunk': child_chunk,
-                    'semantic_score': semantic_score,
-                    'bm25_score': bm25_score,
-                    'hybrid_score': hybrid_score
-                })
-
-        # 按分数排序，取top_k
-        child_results.sort(key=lambda x: x['hybrid_score'], reverse=True)
-        return child_results[:self.config.max_child_results]
-
-    def _semantic_search_children(self, query: str) -> Dict[int, float]:
-        """子chunk语义检索"""
+        return final_results
+
+    def _search_child_chunks(self, original_query: str, expanded_query: str) -> Dict[str, np.ndarray]:
+        """在子chunk级别进行混合检索，返回候选子chunk的下标和各项分数（并行数组，按混合分数降序）"""
+        # 1. 语义检索 + 2. BM25检索
+        needs_embedding_request = (
+            self.child_embeddings is not None and self.embedding_function is not None and
+            original_query not in self._query_embedding_cache
+        )
+        if needs_embedding_request:
+            # 查询向量需要请求embedding接口时，在等待网络返回期间完成BM25检索
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                semantic_future = executor.submit(self._semantic_search_children, original_query)
+                bm25_scores = self._bm25_search_children(expanded_query)
+                semantic_scores = semantic_future.result()
+        else:
+            semantic_scores = self._semantic_search_children(original_query)
+            bm25_scores = self._bm25_search_children(expanded_query)
+
+        # 3. 融合分数：两路分数先各自min-max归一化到[0, 1]，再加权融合
+        # （高频词的IDF可能为负，BM25分数以0为下限，避免未命中的子chunk被抬高）
+        semantic_scores = _min_max_normalize(semantic_scores)
+        bm25_scores = _min_max_normalize(np.maximum(bm25_scores, 0))
+        hybrid_scores = (self.config.semantic_weight * semantic_scores +
+                         self.config.bm25_weight * bm25_scores)
+
+        # 过滤低分结果后取top_k（按分数降序，同分时按子chunk顺序）
+        candidates = np.flatnonzero(hybrid_scores >= self.config.min_score_threshold)
+        candidates = candidates[_top_k_indices(hybrid_scores[candidates], self.config.max_child_results)]
+
+        return {
+            'child_index': candidates,
+            'semantic_score': semantic_scores[candidates],
+            'bm25_score': bm25_scores[candidates],
+            'hybrid_score': hybrid_scores[candidates].astype(np.float64)
+        }
+
+    def _semantic_search_children(self, query: str) -> np.ndarray:
+        """子chunk语义检索，返回每个子chunk的余弦相似度（不可用时全为0，embedding生成失败的子chunk为-inf）"""
         if self.child_embeddings is None or self.embedding_function is None:
-            return {}
+            return np.zeros(len(self.child_chunks), dtype=np.float32)
 
         try:
             # 生成查询向量
-            query_embedding = self.embedding_function([query])[0]
-            query_embedding = np.array(query_embedding).reshape(1, -1)
+            query_embedding = self._get_query_embedding(query)
 
             # 计算相似度
-            similarities = cosine_similarity(query_embedding, self.child_embeddings)[0]
+            if self.child_embeddings_int8 is not None:
+                query_int8, query_scale = _quantize_int8(_normalize_rows(query_embedding))
+                # int32累加int8点积，再乘以两侧的缩放系数还原为余弦相似度
+                dots = np.einsum('ij,j->i', self.child_embeddings_int8, query_int8[0], dtype=np.int32)
+                similarities = dots * (self.child_embedding_scales * query_scale[0])
+            elif self.child_embeddings_normalized.dtype == np.float16:
+                # 矩阵保持float16，计算时逐块提升为float32累加
+                similarities = np.einsum(
+                    'ij,j->i', self.child_embeddings_normalized, _normalize_rows(query_embedding)[0],
+                    dtype=np.float32
+                )
+            else:
+                similarities = self.child_embeddings_normalized @ _normalize_rows(query_embedding)[0]
 
-            return {i: float(score) for i, score in enumerate(similarities)}
+            similarities = np.asarray(similarities, dtype=np.float32)
+            if self.child_embedding_failed is not None:
+                similarities[self.child_embedding_failed] = -np.inf
+            return similarities
         except Exception as e:
             logger.error(f"语义检索失败: {e}")
-            return {}
-
-    def _bm25_search_children(self, query: str) -> Dict[int, float]:
-        """子chunk BM25检索"""
+            return np.zeros(len(self.child_chunks), dtype=np.float32)
+
+    def _get_query_embedding(self, query: str) -> np.ndarray:
+        """生成查询向量，相同查询复用LRU缓存中的结果"""
+        query_embedding = self._query_embedding_cache.get(query)
+        if query_embedding is not None:
+            self._query_embedding_cache.move_to_end(query)
+            return query_embedding
+
+        query_embedding = np.asarray(self.embedding_function([query]), dtype=np.float32).reshape(1, -1)
+        self._query_embedding_cache[query] = query_embedding
+        while len(self._query_embedding_cache) > QUERY_EMBEDDING_CACHE_MAX_ENTRIES:
+            self._query_embedding_cache.popitem(last=False)
+        return query_embedding
+
+    def _bm25_search_children(self, query: str) -> np.ndarray:
+        """子chunk BM25检索，返回每个子chunk的BM25分数（失败时全为0）"""
         try:
-            results = self.bm25_retriever.search(query, top_k=len(self.child_chunks))
-
-            # 归一化分数
-            if results:
-                max_score = max(score for _, score in results) if results else 1.0
-                if max_score > 0:
-                    return {doc_idx: score / max_score for doc_idx, score in results}
-
-            return {}
+            return self.bm25_retriever.get_scores(query)
         except Exception as e:
             logger.error(f"BM25检索失败: {e}")
-            return {}
-
-    def _aggregate_to_parent_level(self, child_results: List[Dict], granularity_weights: dict = None) -> List[HierarchicalResult]:
-        """聚合到父chunk级别（支持智能粒度权重）"""
-        parent_aggregation = {}
-
-        for child_result in child_results:
-            child_chunk = child_result['child_chunk']
-            parent_id = child_chunk.parent_id
-
-            if parent_id not in parent_aggregation:
-                parent_aggregation[parent_id] = {
-                    'parent_chunk': self.parent_id_to_chunk[parent_id],
-                    'child_results': [],
-                    'max_score': 0.0,
-                    'avg_score': 0.0
-                }
-
-            parent_aggregation[parent_id]['child_results'].append(child_result)
-            parent_aggregation[parent_id]['max_score'] = max(
-                parent_aggregation[parent_id]['max_score'],
-                child_result['hybrid_score']
-            )
-
-        # 计算平均分数并创建层次化结果
-        hierarchical_results = []
-        for parent_id, agg_data in parent_aggregation.items():
-            child_results = agg_data['child_results']
-            avg_score = sum(r['hybrid_score'] for r in child_results) / len(child_results)
-            agg_data['avg_score'] = avg_score
-
-            # 为每个子chunk创建层次化结果
-            for child_result in child_results:
-                child_chunk = child_result['child_chunk']
-                parent_chunk = agg_data['parent_chunk']
-
-                # 计算高亮位置
-                highlight_start = child_chunk.position.start_char
-                highlight_end = child_chunk.position.end_char
-
-                # 应用智能粒度权重调整分数
-                adjusted_hybrid_score = child_result['hybrid_score']
-                if granularity_weights:
-                    # 子chunk分数 * 子chunk权重 + 父chunk平均分数 * 父chunk权重
-                    adjusted_hybrid_score = (
-                        child_result['hybrid_score'] * granularity_weights['child_weight'] +
-                        avg_score * granularity_weights['parent_weight']
-                    )
-
-                hierarchical_result = HierarchicalResult(
-                    child_chunk_id=child_chunk.id,
-                    parent_chunk_id=parent_id,
-                    child_content=child_chunk.content,
-                    parent_content=parent_chunk.content,
-                    position=child_chunk.position,
-                    semantic_score=child_result['semantic_score'],
-                    bm25_score=child_result['bm25_score'],
-                    hybrid_score=adjusted_hybrid_score,  # 使用调整后的分数
-                    final_score=0.0,  # 将在最终排序中计算
-                    highlight_start=highlight_start,
-                    highlight_end=highlight_end,
-                    metadata={
-                        'parent_max_score': agg_data['max_score'],
-                        'parent_avg_score': avg_score,
-                        'child_count': len(child_results),
-                        'original_hybrid_score': child_result['hybrid_score'],  # 保存原始分数
-                        'granularity_weights': granularity_weights,  # 保存权重信息
-                        **parent_chunk.metadata
-                    }
-                )
-                hierarchical_results.append(hierarchical_result)
+            return np.zeros(len(self.child_chunks), dtype=np.float32)
+
+    def _aggregate_to_parent_level(self, child_candidates: Dict[str, np.ndarray],
+                                   granularity_weights: dict = None) -> Dict[str, np.ndarray]:
+        """聚合到父chunk级别（支持智能粒度权重），为候选子chunk补充父chunk统计信息和调整后的分数"""
+        child_indices = child_candidates['child_index']
+        child_scores = child_candidates['hybrid_score']
+        if len(child_indices) == 0:
+            return {
+                **child_candidates,
+                'parent_index': np.empty(0, dtype=np.int64),
+                'adjusted_score': np.empty(0, dtype=np.float64),
+                'parent_max_score': np.empty(0, dtype=np.float64),
+                'parent_avg_score': np.empty(0, dtype=np.float64),
+                'child_count': np.empty(0, dtype=np.int64)
+            }
 
-        return hierarchical_results
+        # 按父chunk分段统计最高分、分数和与命中的子chunk数（只为命中的父chunk分配数组）
+        hit_parents, first_seen, parent_slots = np.unique(
+            self.child_to_parent_idx[child_indices], return_index=True, return_inverse=True
+        )
+        parent_max = np.zeros(len(hit_parents))
+        np.maximum.at(parent_max, parent_slots, child_scores)
+        parent_sum = np.zeros(len(hit_parents))
+        np.add.at(parent_sum, parent_slots, child_scores)
+        parent_hits = np.bincount(parent_slots, minlength=len(hit_parents))
+        parent_avg = parent_sum / parent_hits
+
+        # 应用智能粒度权重调整分数：子chunk分数 * 子chunk权重 + 父chunk平均分数 * 父chunk权重
+        adjusted_scores = child_scores
+        if granularity_weights:
+            adjusted_scores = (child_scores * granularity_weights['child_weight'] +
+                               parent_avg[parent_slots] * granularity_weights['parent_weight'])
+
+        # 候选按父chunk首次命中的顺序分组，组内保持子chunk的检索顺序
+        order = np.argsort(first_seen[parent_slots], kind='stable')
+        parent_slots = parent_slots[order]
+        return {
+            **{name: values[order] for name, values in child_candidates.items()},
+            'parent_index': hit_parents[parent_slots],
+            'adjusted_score': adjusted_scores[order],
+            'parent_max_score': parent_max[parent_slots],
+            'parent_avg_score': parent_avg[parent_slots],
+            'child_count': parent_hits[parent_slots]
+        }
 
-    def _final_ranking(self, query: str, hierarchical_results: List[HierarchicalResult], query_type: str = None) -> List[HierarchicalResult]:
-        """基于位置和语义连贯性的最终排序（支持查询类型优化）"""
+    def _final_ranking(self, query: str, child_candidates: Dict[str, np.ndarray], query_type: str = None,
+                       top_k: Optional[int] = None, granularity_weights: dict = None) -> List[HierarchicalResult]:
+        """基于位置和语义连贯性的最终排序（支持查询类型优化），指定top_k时只返回前top_k个结果"""
         query_tokens = set(jieba.lcut(query.lower()))
-
-        for result in hierarchical_results:
-            # 基础分数
-            base_score = result.hybrid_score
-
-            # 位置权重：子chunk在父chunk中的位置
-            position_bonus = self._calculate_position_bonus(result, query_tokens)
-
-            # 语义连贯性权重：考虑相邻子chunk的相关性
-            coherence_bonus = self._calculate_coherence_bonus(result)
-
-            # 父chunk质量权重：考虑父chunk的整体质量
-            parent_quality_bonus = self._calculate_parent_quality_bonus(result)
-
-            # 根据查询类型调整权重
-            position_weight = self.config.position_weight
-            if query_type == 'short':
-                # 短查询更注重精确匹配，减少位置权重
-                position_weight *= 0.5
-            elif query_type == 'long':
-                # 长查询更注重上下文，增加位置权重
-                position_weight *= 1.5
-
-            # 计算最终分数
-            result.final_score = (
-                base_score +
-                position_weight * position_bonus +
-                0.05 * coherence_bonus +
-                0.05 * parent_quality_bonus
-            )
-
-        # 按最终分数排序
-        hierarchical_results.sort(key=lambda x: x.final_score, reverse=True)
+        child_indices = child_candidates['child_index']
+
+        # 基础分数
+        base_scores = child_candidates['adjusted_score']
+
+        # 位置权重：查询词在子chunk中的位置 + 子chunk在父chunk中的位置（前30%加0.2，前60%加0.1）
+        position_in_parent = (self.child_start_char[child_indices] /
+                              np.maximum(self.parent_len_for_child[child_indices], 1))
+        parent_position_bonuses = np.where(position_in_parent < 0.3, 0.2,
+                                           np.where(position_in_parent < 0.6, 0.1, 0.0))
+        position_bonuses = np.fromiter(
+            (self._calculate_position_bonus(child_index, query_tokens) for child_index in child_indices.tolist()),
+            dtype=np.float64, count=len(child_indices)
+        ) + parent_position_bonuses
+
+        # 语义连贯性权重：考虑相邻子chunk的相关性
+        coherence_bonuses = self._calculate_coherence_bonuses(
+            child_candidates['child_count'], child_candidates['parent_avg_score']
+        )
+
+        # 父chunk质量权重：考虑父chunk的整体质量
+        parent_quality_bonuses = self._calculate_parent_quality_bonuses(
+            child_candidates['parent_max_score'], child_candidates['parent_avg_score']
+        )
+
+        # 根据查询类型调整权重
+        position_weight = self.config.position_weight
+        if query_type == 'short':
+            # 短查询更注重精确匹配，减少位置权重
+            position_weight *= 0.5
+        elif query_type == 'long':
+            # 长查询更注重上下文，增加位置权重
+            position_weight *= 1.5
+
+        # 计算最终分数
+        final_scores = (
+            base_scores +
+            position_weight * position_bonuses +
+            0.05 * coherence_bonuses +
+            0.05 * parent_quality_bonuses
+        )
+
+        # 按最终分数排序（同分时保持原有顺序），只为选中的候选构建结果对象
+        k = len(child_indices) if top_k is None else top_k
+        hierarchical_results = [
+            self._build_hierarchical_result(child_candidates, i, float(final_scores[i]), granularity_weights)
+            for i in _top_k_indices(final_scores, k).tolist()
+        ]
 
         if query_type:
             logger.info(f"最终排序完成: 查询类型={query_type}, 结果数={len(hierarchical_results)}")
 
         return hierarchical_results
 
-    def _calculate_position_bonus(self, result: HierarchicalResult, query_tokens: set) -> float:
-        """计算位置权重"""
-        content_tokens = jieba.lcut(result.child_content.lower())
+    def _build_hierarchical_result(self, child_candidates: Dict[str, np.ndarray], i: int, final_score: float,
+                                   granularity_weights: dict = None) -> HierarchicalResult:
+        """由第i个候选子chunk构建层次化检索结果"""
+        child_chunk = self.child_chunks[child_candidates['child_index'][i]]
+        parent_chunk = self.parent_chunks[child_candidates['parent_index'][i]]
+
+        return HierarchicalResult(
+            child_chunk_id=child_chunk.id,
+            parent_chunk_id=parent_chunk.id,
+            child_content=child_chunk.content,
+            parent_content=parent_chunk.content,
+            position=child_chunk.position,
+            semantic_score=float(child_candidates['semantic_score'][i]),
+            bm25_score=float(child_candidates['bm25_score'][i]),
+            hybrid_score=float(child_candidates['adjusted_score'][i]),  # 使用调整后的分数
+            final_score=final_score,
+            highlight_start=child_chunk.position.start_char,  # 高亮位置
+            highlight_end=child_chunk.position.end_char,
+            metadata={
+                'parent_max_score': float(child_candidates['parent_max_score'][i]),
+                'parent_avg_score': float(child_candidates['parent_avg_score'][i]),
+                'child_count': int(child_candidates['child_count'][i]),
+                'original_hybrid_score': float(child_candidates['hybrid_score'][i]),  # 保存原始分数
+                'granularity_weights': granularity_weights,  # 保存权重信息
+                **parent_chunk.metadata
+            }
+        )
+
+    def _calculate_position_bonus(self, child_index: int, query_tokens: set) -> float:
+        """计算查询词在子chunk中的位置权重（子chunk在父chunk中的位置权重在_final_ranking中批量计算）"""
+        content_tokens = self._get_child_tokens(child_index)
         position_bonus = 0.0
 
         # 查询词在子chunk中的位置权重
@@ -671,39 +1046,28 @@ class HierarchicalRetriever:
                 # 位置越靠前权重越高
                 position_bonus += 1.0 / (i + 1)
 
-        # 子chunk在父chunk中的位置权重
-        position_in_parent = result.position.start_char / len(result.parent_content)
-        if position_in_parent < 0.3:  # 在前30%的位置
-            position_bonus += 0.2
-        elif position_in_parent < 0.6:  # 在前60%的位置
-            position_bonus += 0.1
-
         return position_bonus
 
-    def _calculate_coherence_bonus(self, result: HierarchicalResult) -> float:
-        """计算语义连贯性权重"""
-        # 简单实现：基于父chunk中子chunk的数量和分布
-        child_count = result.metadata.get('child_count', 1)
-        parent_avg_score = result.metadata.get('parent_avg_score', 0.0)
+    def _get_child_tokens(self, child_index: int) -> List[str]:
+        """获取子chunk的分词结果，优先使用训练时缓存的分词"""
+        child_chunk = self.child_chunks[child_index]
+        if child_chunk.tokens is not None:
+            return child_chunk.tokens
+        return jieba.lcut(child_chunk.content.lower())
 
+    def _calculate_coherence_bonuses(self, child_counts: np.ndarray, parent_avg_scores: np.ndarray) -> np.ndarray:
+        """批量计算语义连贯性权重"""
+        # 简单实现：基于父chunk中子chunk的数量和分布
         # 如果父chunk有多个高分子chunk，给予连贯性奖励
-        if child_count > 1 and parent_avg_score > 0.3:
-            return min(0.3, child_count * 0.1)
-
-        return 0.0
-
-    def _calculate_parent_quality_bonus(self, result: HierarchicalResult) -> float:
-        """计算父chunk质量权重"""
-        parent_max_score = result.metadata.get('parent_max_score', 0.0)
-        parent_avg_score = result.metadata.get('parent_avg_score', 0.0)
+        return np.where((child_counts > 1) & (parent_avg_scores > 0.3),
+                        np.minimum(0.3, child_counts * 0.1), 0.0)
 
+    def _calculate_parent_quality_bonuses(self, parent_max_scores: np.ndarray,
+                                          parent_avg_scores: np.ndarray) -> np.ndarray:
+        """批量计算父chunk质量权重"""
         # 父chunk的最高分和平均分都高时给予奖励
-        if parent_max_score > 0.5 and parent_avg_score > 0.3:
-            return 0.2
-        elif parent_max_score > 0.3:
-            return 0.1
-
-        return 0.0
+        return np.where((parent_max_scores > 0.5) & (parent_avg_scores > 0.3), 0.2,
+                        np.where(parent_max_scores > 0.3, 0.1, 0.0))
 
     def get_highlighted_content(self, result: HierarchicalResult, query: str) -> str:
         """获取带高亮的内容"""
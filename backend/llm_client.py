@@ -7,6 +7,9 @@ import os
 import json
 import asyncio
 import logging
+import threading
+import weakref
+from functools import lru_cache
 from typing import List, Dict, Any, AsyncGenerator, Optional
 from dotenv import load_dotenv
 
@@ -15,6 +18,181 @@ load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# 可选：orjson（C实现的JSON解析，比标准库json更快），用于解析LLM响应
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+# 共享HTTP客户端的超时时间（秒）和保持的空闲连接数
+HTTP_CLIENT_TIMEOUT = 60.0
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 32
+
+# 每个事件循环一个共享的httpx.AsyncClient（连接不能跨事件循环使用），
+# 复用连接池中的TCP/TLS连接，避免每次请求重新握手
+_http_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+_http_clients_lock = threading.Lock()
+
+
+def _get_http_client():
+    """获取当前事件循环的共享httpx.AsyncClient，不存在或已关闭时创建"""
+    import httpx
+
+    loop = asyncio.get_running_loop()
+    with _http_clients_lock:
+        client = _http_clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                timeout=HTTP_CLIENT_TIMEOUT,
+                limits=httpx.Limits(max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS)
+            )
+            _http_clients[loop] = client
+        return client
+
+
+async def close_http_client():
+    """关闭当前事件循环的共享httpx.AsyncClient（应用关闭时调用）"""
+    loop = asyncio.get_running_loop()
+    with _http_clients_lock:
+        client = _http_clients.pop(loop, None)
+    if client is not None and not client.is_closed:
+        await client.aclose()
+
+
+# 格式化上下文使用的固定文本
+_CONTEXT_HEADER = "基于以下相关文档内容，请回答用户的问题：\n"
+_CONTEXT_INSTRUCTION = "\n\n请严格基于上述文档内容回答用户问题。如果文档中没有相关信息，请直接说明无法找到相关信息，不得提供任何额外的知识或建议。请用中文回答。"
+# 没有检索到文档时的上下文模板
+_EMPTY_RESULT_CONTEXT_TEMPLATE = """用户问题：{user_query}
+
+**检索结果：没有找到相关文档**
+
+根据提供的文档内容，我无法找到与您问题相关的信息。
+
+可能的原因：
+1. 知识库中没有相关信息
+2. 查询关键词与文档内容匹配度较低
+3. 相似度阈值设置过于严格
+
+建议您：
+- 检查文档是否包含相关内容
+- 尝试使用不同的关键词重新查询
+- 降低相似度阈值设置
+- 确认相关文档已上传到集合中"""
+# 没有检索到文档时直接返回的回答（与系统提示词要求的表述一致），无需请求LLM
+_NO_RESULTS_ANSWER = "根据提供的文档内容，我无法找到与您问题相关的信息。建议您检查文档是否包含相关内容，或尝试使用不同的关键词重新查询。"
+
+# 第一层：系统提示词（顶层逻辑约束）
+_SYSTEM_PROMPT = """你是一个严格的知识库问答助手。你必须无条件遵循以下铁律：
+
+【绝对禁止】
+❌ 绝对禁止使用你自身的知识库或训练数据来回答问题
+❌ 绝对禁止在没有文档支持的情况下提供任何实质性信息
+❌ 绝对禁止说"建议您参考以下通用知识"或类似表述
+❌ 绝对禁止编造、推测、补充文档中没有的任何内容
+
+【强制要求】
+✅ 只能基于提供的检索文档内容进行回答
+✅ 如果文档中没有相关信息，必须直接说明："根据提供的文档内容，我无法找到与您问题相关的信息。建议您检查文档是否包含相关内容，或尝试使用不同的关键词重新查询。"
+✅ 回答时必须引用具体的文档来源和相似度信息
+✅ 严格按照文档内容的原意进行回答，不得添加任何解释或扩展
+
+【违规后果】
+如果你违反以上任何一条规则，将被视为系统错误。你必须严格遵守这些约束，没有任何例外。"""
+
+
+
+async def _iter_sse_payloads(response) -> AsyncGenerator[List[bytes], None]:
+    """按网络读取批次解析SSE响应，每批返回本次读取到的全部完整"data: "数据帧负载
+
+    直接在字节层面按行切分，只把JSON负载交给解析器，不对整个响应做文本解码
+    """
+    buffer = bytearray()
+    async for data in response.aiter_bytes():
+        buffer.extend(data)
+        end = buffer.rfind(b"\n")
+        if end == -1:
+            continue
+        # 最后一个换行之后的内容可能不完整，留到下一批
+        lines = bytes(buffer[:end]).split(b"\n")
+        del buffer[:end + 1]
+        payloads = [line[6:].strip() for line in lines if line.startswith(b"data: ")]
+        if payloads:
+            yield payloads
+
+    if buffer.startswith(b"data: "):
+        yield [bytes(buffer[6:]).strip()]
+
+# 支持的LLM提供商及其显示名称（均通过OpenAI兼容的/chat/completions接口调用）
+_PROVIDER_DISPLAY_NAMES = {
+    "deepseek": "DeepSeek",
+    "alibaba": "阿里云",
+}
+# 未配置api_endpoint时各提供商使用的默认接口地址
+_DEFAULT_API_ENDPOINTS = {
+    "deepseek": "https://api.deepseek.com",
+    "alibaba": "https://dashscope.aliyuncs.com/compatible-mode/v1",
+}
+
+
+async def check_chat_completion(provider: str, api_key: str, model: str, api_endpoint: Optional[str] = None) -> int:
+    """
+    发送一次最小的聊天补全请求，验证LLM提供商配置是否可用
+
+    Args:
+        provider: LLM提供商 ("deepseek" 或 "alibaba")
+        api_key: API密钥
+        model: 模型名称
+        api_endpoint: 接口地址，为空时使用提供商的默认地址
+
+    Returns:
+        HTTP响应状态码
+    """
+    api_endpoint = (api_endpoint or "").rstrip("/") or _DEFAULT_API_ENDPOINTS[provider]
+    response = await _get_http_client().post(
+        f"{api_endpoint}/chat/completions",
+        headers={
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        },
+        json={
+            "model": model,
+            "messages": [{"role": "user", "content": "测试"}],
+            "max_tokens": 10
+        }
+    )
+    return response.status_code
+
+# 格式化上下文时优先展示的表格元数据字段（按展示顺序）
+_PRIORITY_METADATA_FIELDS = (
+    'table_案件编号', 'table_序号', 'table_案件标的额 （万元）', 'table_案件状态',
+    'table_发案时间', 'table_争议解决方式', 'table_对方单位性质', 'table_是否保全',
+    'table_保全金额（含保全财产的价值）', 'table_被诉案件实际支付金额'
+)
+_PRIORITY_METADATA_ORDER = {field: i for i, field in enumerate(_PRIORITY_METADATA_FIELDS)}
+# 优先字段之外最多展示的表格元数据字段数
+_MAX_OTHER_METADATA_FIELDS = 5
+# 单条文档内容的最大展示长度（减少document长度为metadata留出空间）
+_MAX_DOC_LEN = 600
+_ELLIPSIS = "..."
+
+@lru_cache(maxsize=64)
+def _build_system_prompt(role_prompt: Optional[str] = None) -> str:
+    """组合系统提示词和角色提示词，相同角色提示词复用缓存结果"""
+    if not role_prompt:
+        return _SYSTEM_PROMPT
+
+    # 第二层：角色提示词（具体任务指导），将角色提示词作为任务指导层
+    return f"""{_SYSTEM_PROMPT}
+
+【角色任务设定】
+{role_prompt}
+
+【重要提醒】
+以上角色设定仅用于指导回答的格式和重点方向，但不得违背核心约束。如果角色要求与核心约束冲突，请优先遵循核心约束。"""
+
+
 class LLMClient:
     """多提供商LLM客户端"""
 
@@ -35,7 +213,7 @@ class LLMClient:
                 self.provider = current_config["provider"]
                 self.config = current_config["config"]
             except Exception as e:
-                logger.warning(f"无法从配置管理器获取LLM配置，使用默认配置: {e}")
+                logger.warning("无法从配置管理器获取LLM配置，使用默认配置: %s", e)
                 # 使用默认配置
                 self.provider = "alibaba"
                 self.config = {
@@ -65,14 +243,10 @@ class LLMClient:
         """设置提供商特定的属性"""
         self.api_key = self.config["api_key"]
         self.model_name = self.config["model"]
-        self.api_endpoint = self.config.get("api_endpoint", "")
-
-        if self.provider == "deepseek":
-            if not self.api_endpoint:
-                self.api_endpoint = "https://api.deepseek.com"
-        elif self.provider == "alibaba":
-            if not self.api_endpoint:
-                self.api_endpoint = "https://dashscope.aliyuncs.com/compatible-mode/v1"
+        self.api_endpoint = (self.config.get("api_endpoint") or "").rstrip("/")
+
+        if not self.api_endpoint:
+            self.api_endpoint = _DEFAULT_API_ENDPOINTS.get(self.provider, "")
     
     def format_context(self, query_results: List[Dict[str, Any]], user_query: str) -> str:
         """
@@ -86,24 +260,15 @@ class LLMClient:
             格式化的上下文字符串
         """
         if not query_results:
-            return f"""用户问题：{user_query}
-
-**检索结果：没有找到相关文档**
-
-根据提供的文档内容，我无法找到与您问题相关的信息。
-
-可能的原因：
-1. 知识库中没有相关信息
-2. 查询关键词与文档内容匹配度较低
-3. 相似度阈值设置过于严格
-
-建议您：
-- 检查文档是否包含相关内容
-- 尝试使用不同的关键词重新查询
-- 降低相似度阈值设置
-- 确认相关文档已上传到集合中"""
+            return _EMPTY_RESULT_CONTEXT_TEMPLATE.format(user_query=user_query)
         
-        context_parts = ["基于以下相关文档内容，请回答用户的问题：\n"]
+        # 所有片段（含换行）依次追加到同一个列表，最后一次性拼接
+        context_parts = [_CONTEXT_HEADER]
+        append = context_parts.append
+        # 元数据筛选循环中用到的全局名称绑定为局部变量
+        priority_order = _PRIORITY_METADATA_ORDER
+        max_other_fields = _MAX_OTHER_METADATA_FIELDS
+        to_str = str
         
         for i, result in enumerate(query_results, 1):
             similarity = (1 - result.get('distance', 0)) * 100
@@ -112,49 +277,45 @@ class LLMClient:
             metadata = result.get('metadata', {})
 
             # 限制单个文档的长度，避免上下文过长
-            max_doc_length = 600  # 减少document长度为metadata留出空间
-            if len(document) > max_doc_length:
-                document = document[:max_doc_length] + "..."
+            if len(document) > _MAX_DOC_LEN:
+                document = document[:_MAX_DOC_LEN] + _ELLIPSIS
 
             # 构建文档内容部分
-            doc_content = f"文档{i}（相似度：{similarity:.1f}%，来源：{collection_name}）：\n"
-            doc_content += f"内容：{document}\n"
+            append(f"\n文档{i}（相似度：{similarity:.1f}%，来源：{collection_name}）：\n")
+            append(f"内容：{document}\n")
 
             # 添加重要的元数据信息
             if metadata:
-                important_metadata = []
-
-                # 提取重要的表格元数据（以table_开头的字段）
-                table_fields = {k: v for k, v in metadata.items() if k.startswith('table_') and v is not None and str(v).strip() != '' and str(v) != 'nan'}
-
-                # 选择最重要的元数据字段显示
-                priority_fields = [
-                    'table_案件编号', 'table_序号', 'table_案件标的额 （万元）', 'table_案件状态',
-                    'table_发案时间', 'table_争议解决方式', 'table_对方单位性质', 'table_是否保全',
-                    'table_保全金额（含保全财产的价值）', 'table_被诉案件实际支付金额'
+                # 一次遍历提取非空的表格元数据（以table_开头的字段），分为优先字段和其他字段
+                priority_values = []
+                other_values = []
+                append_priority = priority_values.append
+                append_other = other_values.append
+                for field, value in metadata.items():
+                    if value is None or not field.startswith('table_'):
+                        continue
+                    value_text = to_str(value)
+                    if not value_text.strip() or value_text == 'nan':
+                        continue
+                    if field in priority_order:
+                        append_priority((field, value_text))
+                    elif len(other_values) < max_other_fields:
+                        append_other((field, value_text))
+
+                # 优先字段按预设顺序排在前面，其他字段（最多5个）保持原有顺序
+                priority_values.sort(key=lambda item: priority_order[item[0]])
+                important_metadata = [
+                    f"{field.replace('table_', '')}: {value_text}"
+                    for field, value_text in priority_values + other_values
                 ]
 
-                # 添加优先字段
-                for field in priority_fields:
-                    if field in table_fields:
-                        field_name = field.replace('table_', '')
-                        important_metadata.append(f"{field_name}: {table_fields[field]}")
-
-                # 添加其他重要字段（最多5个）
-                other_fields = [k for k in table_fields.keys() if k not in priority_fields][:5]
-                for field in other_fields:
-                    field_name = field.replace('table_', '')
-                    important_metadata.append(f"{field_name}: {table_fields[field]}")
-
                 if important_metadata:
-                    doc_content += f"相关数据：{' | '.join(important_metadata)}\n"
-
-            context_parts.append(doc_content)
+                    append(f"相关数据：{' | '.join(important_metadata)}\n")
         
-        context_parts.append(f"\n用户问题：{user_query}")
-        context_parts.append("\n请严格基于上述文档内容回答用户问题。如果文档中没有相关信息，请直接说明无法找到相关信息，不得提供任何额外的知识或建议。请用中文回答。")
+        append(f"\n\n用户问题：{user_query}")
+        append(_CONTEXT_INSTRUCTION)
         
-        return "\n".join(context_parts)
+        return "".join(context_parts)
     
     def create_prompt(self, context: str, role_prompt: str = None) -> List[Dict[str, str]]:
         """
@@ -167,36 +328,8 @@ class LLMClient:
         Returns:
             消息列表
         """
-        # 第一层：系统提示词（顶层逻辑约束）
-        system_prompt = """你是一个严格的知识库问答助手。你必须无条件遵循以下铁律：
-
-【绝对禁止】
-❌ 绝对禁止使用你自身的知识库或训练数据来回答问题
-❌ 绝对禁止在没有文档支持的情况下提供任何实质性信息
-❌ 绝对禁止说"建议您参考以下通用知识"或类似表述
-❌ 绝对禁止编造、推测、补充文档中没有的任何内容
-
-【强制要求】
-✅ 只能基于提供的检索文档内容进行回答
-✅ 如果文档中没有相关信息，必须直接说明："根据提供的文档内容，我无法找到与您问题相关的信息。建议您检查文档是否包含相关内容，或尝试使用不同的关键词重新查询。"
-✅ 回答时必须引用具体的文档来源和相似度信息
-✅ 严格按照文档内容的原意进行回答，不得添加任何解释或扩展
-
-【违规后果】
-如果你违反以上任何一条规则，将被视为系统错误。你必须严格遵守这些约束，没有任何例外。"""
-
-        # 第二层：角色提示词（具体任务指导）
-        if role_prompt:
-            # 将角色提示词作为任务指导层
-            combined_system_prompt = f"""{system_prompt}
-
-【角色任务设定】
-{role_prompt}
-
-【重要提醒】
-以上角色设定仅用于指导回答的格式和重点方向，但不得违背核心约束。如果角色要求与核心约束冲突，请优先遵循核心约束。"""
-        else:
-            combined_system_prompt = system_prompt
+        # 第一层：系统提示词（顶层逻辑约束）+ 第二层：角色提示词（具体任务指导）
+        combined_system_prompt = _build_system_prompt(role_prompt)
 
         return [
             {
@@ -226,11 +359,9 @@ class LLMClient:
         Yields:
             流式响应数据块
         """
-        if self.provider == "alibaba":
-            async for chunk in self._stream_chat_alibaba(messages, temperature, max_tokens):
-                yield chunk
-        elif self.provider == "deepseek":
-            async for chunk in self._stream_chat_deepseek(messages, temperature, max_tokens):
+        if self.provider in _PROVIDER_DISPLAY_NAMES:
+            # DeepSeek和阿里云（兼容模式）都提供OpenAI兼容的流式接口，共用同一条SSE处理路径
+            async for chunk in self._stream_chat_openai_compatible(messages, temperature, max_tokens):
                 yield chunk
         else:
             yield {
@@ -239,114 +370,15 @@ class LLMClient:
                 'error': f'不支持的LLM提供商: {self.provider}'
             }
 
-    async def _stream_chat_alibaba(
+    async def _stream_chat_openai_compatible(
         self,
         messages: List[Dict[str, str]],
         temperature: float = 0.7,
         max_tokens: int = 2000
     ) -> AsyncGenerator[Dict[str, Any], None]:
-        """阿里云通义千问流式聊天"""
+        """OpenAI兼容接口（/chat/completions）的流式聊天"""
+        provider_name = _PROVIDER_DISPLAY_NAMES[self.provider]
         try:
-            import dashscope
-            from dashscope import Generation
-            import asyncio
-
-            # 设置API密钥
-            dashscope.api_key = self.api_key
-
-            # 构建请求参数 - 使用非流式调用来避免DashScope流式API的bug
-            request_params = {
-                'model': self.model_name,
-                'messages': messages,
-                'temperature': temperature,
-                'max_tokens': max_tokens,
-                'stream': False  # 使用非流式调用
-            }
-
-            logger.info(f"开始阿里云LLM请求，模型：{self.model_name}")
-
-            # 调用非流式API
-            response = Generation.call(**request_params)
-
-            if response.status_code == 200:
-                # 解析响应
-                output = response.output
-                if output and 'text' in output:
-                    full_content = output['text']
-                    usage = response.usage if hasattr(response, 'usage') else None
-
-                    logger.info(f"完整内容长度: {len(full_content)} 字符")
-
-                    # 模拟流式效果：将完整内容分块发送
-                    chunk_size = 2  # 每次发送2个字符
-                    for i in range(0, len(full_content), chunk_size):
-                        chunk = full_content[i:i + chunk_size]
-
-                        # 发送当前块
-                        yield {
-                            'content': chunk,
-                            'finish_reason': None,
-                            'usage': None
-                        }
-
-                        # 添加小延迟模拟流式效果
-                        await asyncio.sleep(0.05)  # 50ms延迟
-
-                    # 发送完成信号
-                    yield {
-                        'content': '',
-                        'finish_reason': 'stop',
-                        'usage': usage
-                    }
-
-                    logger.info("阿里云LLM请求完成")
-                else:
-                    logger.warning(f"响应中没有text字段: {output}")
-                    yield {
-                        'content': '',
-                        'finish_reason': 'error',
-                        'error': '响应格式错误'
-                    }
-            else:
-                error_msg = f"阿里云LLM API调用失败，状态码：{response.status_code}"
-                if hasattr(response, 'message'):
-                    error_msg += f"，错误信息：{response.message}"
-
-                logger.error(error_msg)
-                yield {
-                    'content': '',
-                    'finish_reason': 'error',
-                    'error': error_msg
-                }
-
-        except ImportError:
-            error_msg = "dashscope库未安装，请运行：pip install dashscope"
-            logger.error(error_msg)
-            yield {
-                'content': '',
-                'finish_reason': 'error',
-                'error': error_msg
-            }
-        except Exception as e:
-            error_msg = f"阿里云LLM调用异常：{str(e)}"
-            logger.error(error_msg)
-            yield {
-                'content': '',
-                'finish_reason': 'error',
-                'error': error_msg
-            }
-
-    async def _stream_chat_deepseek(
-        self,
-        messages: List[Dict[str, str]],
-        temperature: float = 0.7,
-        max_tokens: int = 2000
-    ) -> AsyncGenerator[Dict[str, Any], None]:
-        """DeepSeek流式聊天"""
-        try:
-            import httpx
-            import json
-
             headers = {
                 "Authorization": f"Bearer {self.api_key}",
                 "Content-Type": "application/json"
@@ -357,65 +389,28 @@ class LLMClient:
                 "messages": messages,
                 "temperature": temperature,
                 "max_tokens": max_tokens,
-                "stream": False  # 暂时使用非流式，后续可以改为流式
+                "stream": True,
+                "stream_options": {"include_usage": True}  # 最后一个数据块返回token使用情况
             }
 
-            logger.info(f"开始DeepSeek LLM请求，模型：{self.model_name}")
-            logger.info(f"请求参数: max_tokens={max_tokens}, temperature={temperature}")
-            logger.info(f"消息数量: {len(messages)}")
-
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.api_endpoint}/chat/completions",
-                    headers=headers,
-                    json=data,
-                    timeout=60.0
-                )
-
-                if response.status_code == 200:
-                    result = response.json()
-                    logger.info(f"DeepSeek完整响应: {json.dumps(result, indent=2, ensure_ascii=False)}")
-
-                    if "choices" in result and len(result["choices"]) > 0:
-                        content = result["choices"][0]["message"]["content"]
-                        usage = result.get("usage")
-                        finish_reason = result["choices"][0].get("finish_reason")
-
-                        logger.info(f"DeepSeek响应长度: {len(content)} 字符")
-                        logger.info(f"DeepSeek完成原因: {finish_reason}")
-                        logger.info(f"DeepSeek使用情况: {usage}")
-
-                        # 模拟流式效果
-                        chunk_size = 2
-                        for i in range(0, len(content), chunk_size):
-                            chunk = content[i:i + chunk_size]
-
-                            yield {
-                                'content': chunk,
-                                'finish_reason': None,
-                                'usage': None
-                            }
-
-                            await asyncio.sleep(0.05)
-
-                        # 发送完成信号
-                        yield {
-                            'content': '',
-                            'finish_reason': 'stop',
-                            'usage': usage
-                        }
-
-                        logger.info("DeepSeek LLM请求完成")
-                    else:
-                        yield {
-                            'content': '',
-                            'finish_reason': 'error',
-                            'error': 'DeepSeek响应格式错误'
-                        }
-                else:
-                    error_msg = f"DeepSeek API调用失败，状态码：{response.status_code}"
+            logger.info("开始%s LLM请求，模型：%s", provider_name, self.model_name)
+            logger.info("请求参数: max_tokens=%s, temperature=%s", max_tokens, temperature)
+            logger.info("消息数量: %s", len(messages))
+
+            client = _get_http_client()
+            async with client.stream(
+                "POST",
+                f"{self.api_endpoint}/chat/completions",
+                headers=headers,
+                json=data,
+                timeout=HTTP_CLIENT_TIMEOUT
+            ) as response:
+
+                if response.status_code != 200:
+                    await response.aread()
+                    error_msg = f"{provider_name} API调用失败，状态码：{response.status_code}"
                     try:
-                        error_detail = response.json()
+                        error_detail = _json_loads(response.content)
                         if "error" in error_detail:
                             error_msg += f"，错误信息：{error_detail['error']}"
                     except:
@@ -427,6 +422,69 @@ class LLMClient:
                         'finish_reason': 'error',
                         'error': error_msg
                     }
+                    return
+
+                # 按网络读取批次解析SSE数据帧（"data: {...}"），同一批到达的增量内容合并后立即转发，
+                # 既不增加首字延迟，也避免每个token都经过一次生成器恢复和事件循环调度
+                content_length = 0
+                finish_reason = None
+                usage = None
+                stream_done = False
+                debug_enabled = logger.isEnabledFor(logging.DEBUG)
+                async for payloads in _iter_sse_payloads(response):
+                    pieces = []
+                    for payload in payloads:
+                        if payload == b"[DONE]":
+                            stream_done = True
+                            break
+
+                        # 每个数据帧只解析一次，完整内容仅在DEBUG级别输出
+                        result = _json_loads(payload)
+                        if debug_enabled:
+                            logger.debug("%s响应数据块: %s", provider_name, result)
+
+                        usage = result.get("usage") or usage
+                        choices = result.get("choices")
+                        if not choices:
+                            continue
+
+                        choice = choices[0]
+                        finish_reason = choice.get("finish_reason") or finish_reason
+                        delta = choice.get("delta") or {}
+                        if delta.get("content"):
+                            pieces.append(delta["content"])
+
+                    if pieces:
+                        content = "".join(pieces)
+                        content_length += len(content)
+                        yield {
+                            'content': content,
+                            'finish_reason': None,
+                            'usage': None
+                        }
+                    if stream_done:
+                        break
+
+                logger.info("%s响应长度: %s 字符", provider_name, content_length)
+                logger.info("%s完成原因: %s", provider_name, finish_reason)
+                logger.info("%s使用情况: %s", provider_name, usage)
+
+                if content_length == 0 and finish_reason is None:
+                    yield {
+                        'content': '',
+                        'finish_reason': 'error',
+                        'error': f'{provider_name}响应格式错误'
+                    }
+                    return
+
+                # 发送完成信号
+                yield {
+                    'content': '',
+                    'finish_reason': 'stop',
+                    'usage': usage
+                }
+
+                logger.info("%s LLM请求完成", provider_name)
 
         except ImportError:
             error_msg = "httpx库未安装，请运行：pip install httpx"
@@ -437,7 +495,7 @@ class LLMClient:
                 'error': error_msg
             }
         except Exception as e:
-            error_msg = f"DeepSeek LLM调用异常：{str(e)}"
+            error_msg = f"{provider_name} LLM调用异常：{str(e)}"
             logger.error(error_msg)
             yield {
                 'content': '',
@@ -466,6 +524,16 @@ class LLMClient:
         Yields:
             流式响应数据块
         """
+        # 没有检索结果时模型只能回答无法找到相关信息，直接返回固定回答，省去LLM请求
+        if not query_results:
+            logger.info("没有检索结果，跳过LLM请求直接返回")
+            yield {
+                'content': _NO_RESULTS_ANSWER,
+                'finish_reason': 'stop',
+                'usage': None
+            }
+            return
+
         # 格式化上下文
         context = self.format_context(query_results, user_query)
 
@@ -478,11 +546,11 @@ class LLMClient:
                 role = role_manager.get_role(role_id)
                 if role and role.is_active:
                     role_prompt = role.prompt
-                    logger.info(f"使用角色提示词: {role.name}")
+                    logger.info("使用角色提示词: %s", role.name)
                 else:
-                    logger.warning(f"角色不存在或未启用: {role_id}")
+                    logger.warning("角色不存在或未启用: %s", role_id)
             except Exception as e:
-                logger.warning(f"获取角色提示词失败: {e}")
+                logger.warning("获取角色提示词失败: %s", e)
 
         # 创建提示消息
         messages = self.create_prompt(context, role_prompt)
@@ -491,29 +559,72 @@ class LLMClient:
         async for chunk in self.stream_chat(messages, temperature, max_tokens):
             yield chunk
 
-# 全局LLM客户端实例
+    async def _collect_query(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """执行单个问答任务，将流式响应收集为一个完整结果"""
+        content_parts = []
+        result = {'content': '', 'finish_reason': None}
+        async for chunk in self.query_with_context(**job):
+            if chunk.get('content'):
+                content_parts.append(chunk['content'])
+            if chunk.get('finish_reason'):
+                result.update(chunk)
+                break
+        result['content'] = ''.join(content_parts)
+        return result
+
+    async def query_many(self, jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        并发执行多个问答任务（例如同一问题的多个角色），重叠各请求的网络往返
+
+        Args:
+            jobs: 问答任务列表，每项为query_with_context的关键字参数
+
+        Returns:
+            与jobs顺序一致的结果列表，每项包含完整的content、finish_reason，
+            以及usage或error
+        """
+        return await asyncio.gather(*(self._collect_query(job) for job in jobs))
+
+# 全局LLM客户端实例，以及创建它时的配置版本
 llm_client = None
+_llm_client_config_version = None
+
+def _get_config_version():
+    """获取当前配置版本，无法获取时返回None（此时每次都重新创建客户端）"""
+    try:
+        from config_manager import get_config_version
+        return get_config_version()
+    except Exception as e:
+        logger.warning("无法获取配置版本: %s", e)
+        return None
 
 def get_llm_client() -> Optional[LLMClient]:
-    """获取LLM客户端实例"""
-    global llm_client
+    """获取LLM客户端实例，配置未变化时复用已创建的客户端"""
+    global llm_client, _llm_client_config_version
+    config_version = _get_config_version()
+    if llm_client is not None and config_version is not None and config_version == _llm_client_config_version:
+        return llm_client
+
     try:
-        # 每次都重新创建客户端以确保使用最新配置
+        # 配置发生变化（或首次调用）时重新创建客户端以确保使用最新配置
         llm_client = LLMClient()
+        _llm_client_config_version = config_version
         return llm_client
     except Exception as e:
-        logger.error(f"获取LLM客户端失败：{e}")
+        logger.error("获取LLM客户端失败：%s", e)
         return None
 
 def init_llm_client():
     """初始化LLM客户端"""
-    global llm_client
+    global llm_client, _llm_client_config_version
     try:
+        config_version = _get_config_version()
         llm_client = LLMClient()
+        _llm_client_config_version = config_version
         logger.info("LLM客户端初始化成功")
         return llm_client
     except Exception as e:
-        logger.error(f"LLM客户端初始化失败：{e}")
+        logger.error("LLM客户端初始化失败：%s", e)
         return None
 
 def create_llm_client(provider: str, config: Dict) -> Optional[LLMClient]:
@@ -521,5 +632,5 @@ def create_llm_client(provider: str, config: Dict) -> Optional[LLMClient]:
     try:
         return LLMClient(provider=provider, config=config)
     except Exception as e:
-        logger.error(f"创建LLM客户端失败：{e}")
+        logger.error("创建LLM客户端失败：%s", e)
         return None
@@ -7,6 +7,7 @@ ChromaDB Web Manager - 后端主应用
 from fastapi import FastAPI, HTTPException, File, UploadFile, Form, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from contextlib import asynccontextmanager
 import chromadb
 from chromadb.config import Settings
@@ -16,6 +17,7 @@ import logging
 from typing import List, Optional, AsyncGenerator, Callable, Awaitable
 import base64
 import hashlib
+from functools import lru_cache
 from pydantic import BaseModel
 from dotenv import load_dotenv
 import os
@@ -69,8 +71,9 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# ChromaDB客户端
+# ChromaDB客户端，以及持久化客户端使用的数据目录（回退到内存客户端时为None）
 chroma_client = None
+chroma_persist_path = None
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -103,6 +106,13 @@ async def lifespan(app: FastAPI):
     # 关闭时清理（如果需要的话）
     logger.info("应用关闭，清理资源")
 
+    # 关闭LLM客户端共享的HTTP连接池
+    try:
+        from llm_client import close_http_client
+        await close_http_client()
+    except Exception as e:
+        logger.warning(f"关闭LLM HTTP客户端失败: {e}")
+
 # 创建FastAPI应用
 app = FastAPI(
     title="ChromaDB Web Manager",
@@ -130,7 +140,8 @@ include_consistency_routes(app)
 
 def init_chroma_client():
     """初始化ChromaDB客户端"""
-    global chroma_client
+    global chroma_client, chroma_persist_path
+    chroma_persist_path = None
     try:
         # 使用跨平台工具获取ChromaDB数据路径
         chroma_path = platform_utils.get_chroma_data_directory()
@@ -139,6 +150,7 @@ def init_chroma_client():
         # ChromaDB 1.0+版本使用新的API
         # 使用持久化客户端，确保数据永久保存
         chroma_client = chromadb.PersistentClient(path=str(chroma_path))
+        chroma_persist_path = chroma_path
         logger.info("ChromaDB持久化客户端初始化成功")
 
     except Exception as e:
@@ -148,10 +160,11 @@ def init_chroma_client():
         chroma_client = chromadb.EphemeralClient()
         logger.info("ChromaDB内存客户端初始化成功（回退模式）")
 
+@lru_cache(maxsize=4096)
 def encode_collection_name(chinese_name: str) -> str:
     """
     将中文集合名称编码为ChromaDB兼容的名称
-    使用MD5哈希 + 字母数字字符确保兼容性
+    使用MD5哈希 + 字母数字字符确保兼容性（结果按名称缓存）
     """
     # 使用MD5哈希生成固定长度的字符串
     hash_object = hashlib.md5(chinese_name.encode('utf-8'))
@@ -392,68 +405,143 @@ async def manual_cleanup():
 
 
 
+# 集合分块统计：按集合统计分块数和唯一文件数（file_name优先，其次source_file）
+_COLLECTION_CHUNK_STATS_SQL = """
+    SELECT s.collection,
+           COUNT(*),
+           COUNT(DISTINCT COALESCE(
+               NULLIF((SELECT string_value FROM embedding_metadata
+                       WHERE id = e.id AND key = 'file_name'), ''),
+               NULLIF((SELECT string_value FROM embedding_metadata
+                       WHERE id = e.id AND key = 'source_file'), '')
+           ))
+    FROM embeddings e
+    JOIN segments s ON e.segment_id = s.id
+    GROUP BY s.collection
+"""
+# 集合分块统计：每个集合使用过的分块方式
+_COLLECTION_CHUNK_METHODS_SQL = """
+    SELECT DISTINCT s.collection, m.string_value
+    FROM embedding_metadata m
+    JOIN embeddings e ON m.id = e.id
+    JOIN segments s ON e.segment_id = s.id
+    WHERE m.key = 'chunk_method' AND m.string_value <> ''
+"""
+
+def _load_collection_chunk_statistics() -> Optional[dict]:
+    """
+    直接以只读方式查询ChromaDB的SQLite数据库，一次性统计所有集合的分块信息
+    返回 集合ID -> {'total_chunks', 'files_count', 'methods_used'}，无法查询时返回None
+    """
+    # 只有当前使用的是该目录下的持久化客户端时，磁盘上的数据才与客户端一致
+    if chroma_persist_path is None:
+        return None
+
+    db_path = chroma_persist_path / "chroma.sqlite3"
+    if not db_path.exists():
+        return None
+
+    try:
+        conn = sqlite3.connect(f"{db_path.resolve().as_uri()}?mode=ro", uri=True)
+        try:
+            statistics = {
+                collection_id: {
+                    'total_chunks': total_chunks,
+                    'files_count': files_count,
+                    'methods_used': []
+                }
+                for collection_id, total_chunks, files_count in conn.execute(_COLLECTION_CHUNK_STATS_SQL)
+            }
+            for collection_id, chunk_method in conn.execute(_COLLECTION_CHUNK_METHODS_SQL):
+                if collection_id in statistics:
+                    statistics[collection_id]['methods_used'].append(chunk_method)
+            return statistics
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.warning(f"通过SQLite统计集合分块信息失败，回退到逐个集合统计: {e}")
+        return None
+
+def _scan_collection_chunk_statistics(collection):
+    """逐条读取集合元数据统计分块信息（无法直接查询SQLite时的回退方式），返回(文档数, 文件数, 分块统计)"""
+    # 获取集合中的文档数量
+    try:
+        count = collection.count()
+    except:
+        count = 0
+
+    # 获取文件统计信息
+    files_count = 0  # 默认为0而不是None
+    chunk_statistics = None
+    try:
+        if count > 0:
+            # 获取所有文档的元数据来计算文件统计
+            docs_result = collection.get(limit=count, include=['metadatas'])
+            if docs_result and docs_result['metadatas']:
+                # 统计唯一文件数
+                unique_files = set()
+                methods_used = set()
+
+                for doc_metadata in docs_result['metadatas']:
+                    if doc_metadata:
+                        file_name = doc_metadata.get('file_name') or doc_metadata.get('source_file')
+                        if file_name:
+                            unique_files.add(file_name)
+
+                        chunk_method = doc_metadata.get('chunk_method')
+                        if chunk_method:
+                            methods_used.add(chunk_method)
+
+                files_count = len(unique_files)
+                chunk_statistics = {
+                    'total_chunks': count,
+                    'files_count': files_count,
+                    'methods_used': list(methods_used)
+                }
+        else:
+            # 对于空集合，设置基本的统计信息
+            chunk_statistics = {
+                'total_chunks': 0,
+                'files_count': 0,
+                'methods_used': []
+            }
+    except Exception as e:
+        logger.warning(f"获取集合 {collection.name} 的文件统计信息失败: {e}")
+        # 即使出错也要确保有基本的统计信息
+        files_count = 0
+        chunk_statistics = {
+            'total_chunks': count,
+            'files_count': 0,
+            'methods_used': []
+        }
+
+    return count, files_count, chunk_statistics
+
 @app.get("/api/collections", response_model=List[CollectionInfo])
 async def get_collections():
     """获取所有集合列表"""
     try:
         collections = chroma_client.list_collections()
         result = []
+        # 一次SQL聚合得到所有集合的分块统计，避免逐个集合读取全部元数据
+        all_chunk_statistics = _load_collection_chunk_statistics()
 
         for collection in collections:
             # 从元数据中获取原始中文名称
             metadata = collection.metadata or {}
             display_name = metadata.get('original_name', collection.name)
 
-            # 获取集合中的文档数量
-            try:
-                count = collection.count()
-            except:
-                count = 0
-
-            # 获取文件统计信息
-            files_count = 0  # 默认为0而不是None
-            chunk_statistics = None
-            try:
-                if count > 0:
-                    # 获取所有文档的元数据来计算文件统计
-                    docs_result = collection.get(limit=count, include=['metadatas'])
-                    if docs_result and docs_result['metadatas']:
-                        # 统计唯一文件数
-                        unique_files = set()
-                        methods_used = set()
-
-                        for doc_metadata in docs_result['metadatas']:
-                            if doc_metadata:
-                                file_name = doc_metadata.get('file_name') or doc_metadata.get('source_file')
-                                if file_name:
-                                    unique_files.add(file_name)
-
-                                chunk_method = doc_metadata.get('chunk_method')
-                                if chunk_method:
-                                    methods_used.add(chunk_method)
-
-                        files_count = len(unique_files)
-                        chunk_statistics = {
-                            'total_chunks': count,
-                            'files_count': files_count,
-                            'methods_used': list(methods_used)
-                        }
-                else:
-                    # 对于空集合，设置基本的统计信息
-                    chunk_statistics = {
-                        'total_chunks': 0,
-                        'files_count': 0,
-                        'methods_used': []
-                    }
-            except Exception as e:
-                logger.warning(f"获取集合 {collection.name} 的文件统计信息失败: {e}")
-                # 即使出错也要确保有基本的统计信息
-                files_count = 0
-                chunk_statistics = {
-                    'total_chunks': count,
+            if all_chunk_statistics is not None:
+                # 没有任何分块的集合不会出现在统计结果中
+                chunk_statistics = all_chunk_statistics.get(str(collection.id)) or {
+                    'total_chunks': 0,
                     'files_count': 0,
                     'methods_used': []
                 }
+                count = chunk_statistics['total_chunks']
+                files_count = chunk_statistics['files_count']
+            else:
+                count, files_count, chunk_statistics = _scan_collection_chunk_statistics(collection)
 
             # 从元数据中提取向量维数，如果没有则尝试从实际向量中获取
             dimension = metadata.get('vector_dimension')
@@ -995,7 +1083,7 @@ async def websocket_endpoint(websocket: WebSocket):
         manager.disconnect(websocket)
 
 @app.get("/api/data/cleanup/scan")
-async def scan_orphaned_data():
+async def scan_orphaned_data(verbose: bool = False):
     """扫描孤立数据"""
     try:
         from data_cleanup_tool import get_data_cleanup_tool
@@ -1005,7 +1093,7 @@ async def scan_orphaned_data():
             client=chroma_client
         )
 
-        analysis = cleanup_tool.scan_for_orphaned_data()
+        analysis = cleanup_tool.scan_for_orphaned_data(verbose=verbose)
 
         return {
             "success": True,
@@ -1418,7 +1506,8 @@ async def upload_document(
         # 使用文件解析器解析文件
         logger.info(f"开始解析文件: {file.filename} ({file_size_mb:.2f}MB)")
         parse_start_time = time.time()
-        parse_result = file_parser_manager.parse_file(content, file.filename)
+        # 解析是CPU密集的同步操作，放到线程池中执行，避免阻塞事件循环
+        parse_result = await run_in_threadpool(file_parser_manager.parse_file, content, file.filename)
         parse_time = time.time() - parse_start_time
         logger.info(f"文件解析完成: success={parse_result.success}, is_table={parse_result.is_table}, 耗时: {parse_time:.2f}秒")
 
@@ -2062,7 +2151,8 @@ async def upload_document_stream(
 
             # 解析文件
             yield f"data: {json.dumps(UploadProgressUpdate(stage='processing', percent=25, message='正在解析文件内容...').model_dump())}\n\n"
-            parse_result = file_parser_manager.parse_file(content, file.filename)
+            # 解析是CPU密集的同步操作，放到线程池中执行，避免阻塞事件循环
+            parse_result = await run_in_threadpool(file_parser_manager.parse_file, content, file.filename)
 
             if not parse_result.success:
                 yield f"data: {json.dumps(UploadProgressUpdate(stage='error', percent=0, message=f'文件解析失败: {parse_result.error_message}').model_dump())}\n\n"
@@ -3446,20 +3536,12 @@ async def test_alibaba_llm_config(config: dict) -> dict:
 
         # 测试阿里云LLM API
         try:
-            import dashscope
-            from dashscope import Generation
+            from llm_client import check_chat_completion
 
-            # 设置API密钥
-            dashscope.api_key = api_key
-
-            # 发送测试请求
-            response = Generation.call(
-                model=model,
-                messages=[{"role": "user", "content": "测试"}],
-                max_tokens=10
-            )
+            # 通过OpenAI兼容接口异步发送测试请求，避免阻塞事件循环
+            status_code = await check_chat_completion("alibaba", api_key, model, api_endpoint)
 
-            if response.status_code == 200:
+            if status_code == 200:
                 return {
                     "success": True,
                     "message": f"阿里云LLM模型 {model} 验证成功",
@@ -3468,11 +3550,11 @@ async def test_alibaba_llm_config(config: dict) -> dict:
             else:
                 return {
                     "success": False,
-                    "message": f"API调用失败，状态码：{response.status_code}"
+                    "message": f"API调用失败，状态码：{status_code}"
                 }
 
         except ImportError:
-            return {"success": False, "message": "dashscope库未安装"}
+            return {"success": False, "message": "httpx库未安装"}
         except Exception as e:
             return {"success": False, "message": f"API调用失败: {str(e)}"}
 
@@ -0,0 +1,9 @@
+"""
+测试配置
+后端模块按平铺方式互相导入（如 from llm_client import ...），测试时将backend目录加入导入路径
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
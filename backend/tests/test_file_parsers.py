@@ -0,0 +1,71 @@
+"""
+文件解析器测试
+"""
+
+import codecs
+
+import pytest
+
+from file_parsers import FileParserManager
+
+pytest.importorskip("pandas")
+
+
+def test_parse_short_gbk_csv_keeps_chinese_column_names():
+    """Excel在中文Windows上导出的GBK编码CSV应正确解析列名（不能被误判为cp949等编码）"""
+    content = "名称,价格\n苹果,5\n香蕉,3\n".encode("gbk")
+
+    result = FileParserManager().parse_file(content, "商品.csv")
+
+    assert result.success
+    assert result.metadata["encoding"] == "gbk"
+    assert result.metadata["columns"] == "名称, 价格"
+    assert result.table_data[0]["名称"] == "苹果"
+
+
+def test_parse_utf8_bom_csv_strips_bom_from_first_column():
+    """带BOM的UTF-8 CSV的第一个列名不应包含BOM"""
+    content = codecs.BOM_UTF8 + "名称,价格\n苹果,5\n".encode("utf-8")
+
+    result = FileParserManager().parse_file(content, "商品.csv")
+
+    assert result.success
+    assert result.metadata["columns"] == "名称, 价格"
+
+
+def test_keyword_column_analysis_matches_whole_words_only():
+    """列名关键词按整词匹配："valid"不应命中"id"，未命中的列留给LLM判断"""
+    import pandas as pd
+
+    from file_parsers import TableFileParser
+
+    df = pd.DataFrame(columns=["valid", "width", "update_count", "createdAt", "product_name"])
+
+    assert TableFileParser()._keyword_column_analysis(df) == {
+        "update_count": "metadata",
+        "createdAt": "metadata",
+        "product_name": "content",
+    }
+
+
+def test_read_csv_bytes_matches_c_engine_values():
+    """pyarrow引擎读取的行数据应与C引擎一致，日期/时间列保留原始字符串"""
+    pytest.importorskip("pyarrow")
+    import io
+
+    import pandas as pd
+
+    from file_parsers import TableFileParser
+
+    content = (
+        "编号,日期,时间戳,时刻,名称,价格\n"
+        "1,2024-01-02,2024-01-02 10:00:00,10:00:00,苹果,5.5\n"
+        "2,2024-01-03,2024-01-03 11:30:00,11:30:00,香蕉,\n"
+    ).encode("utf-8")
+
+    pyarrow_rows = TableFileParser()._read_csv_bytes(pd, content, "utf-8").to_dict("records")
+    c_rows = pd.read_csv(io.BytesIO(content), encoding="utf-8", engine="c").to_dict("records")
+
+    assert pyarrow_rows[0]["日期"] == "2024-01-02"
+    assert pyarrow_rows[0]["时间戳"] == "2024-01-02 10:00:00"
+    assert pd.DataFrame(pyarrow_rows).equals(pd.DataFrame(c_rows))
@@ -0,0 +1,107 @@
+"""
+层次化混合检索测试
+"""
+
+import numpy as np
+import pytest
+
+pytest.importorskip("scipy")
+pytest.importorskip("jieba")
+
+from hybrid_retrieval import HierarchicalConfig, HierarchicalRetriever
+
+DOCUMENTS = [
+    "机器学习是人工智能的一个分支。它通过数据训练模型。" * 5,
+    "向量数据库用于存储和检索embedding。相似度检索基于余弦距离。" * 5,
+]
+
+
+class CountingEmbedding:
+    """按文本内容生成确定性向量的embedding函数，记录调用次数，可指定对某些批次抛出异常"""
+
+    def __init__(self, fail_texts=None):
+        self.calls = 0
+        self.fail_texts = set(fail_texts or [])
+
+    def __call__(self, texts):
+        self.calls += 1
+        if self.fail_texts.intersection(texts):
+            raise RuntimeError("embedding服务不可用")
+        return np.array([[len(text), sum(map(ord, text)) % 97 + 1, 1.0] for text in texts], dtype=np.float32)
+
+
+def _make_config(**overrides):
+    options = dict(child_chunk_size=40, overlap_size=5, embedding_batch_size=1,
+                   embedding_max_workers=1, embedding_max_retries=0)
+    options.update(overrides)
+    return HierarchicalConfig(**options)
+
+
+def test_fit_skips_unchanged_documents():
+    """相同文档集和embedding函数再次训练时不重新生成向量"""
+    embedding = CountingEmbedding()
+    retriever = HierarchicalRetriever(_make_config())
+
+    retriever.fit(DOCUMENTS, embedding)
+    calls_after_first_fit = embedding.calls
+    retriever.fit(DOCUMENTS, embedding)
+
+    assert calls_after_first_fit > 0
+    assert embedding.calls == calls_after_first_fit
+
+
+def test_fit_reloads_embeddings_from_cache_dir(tmp_path):
+    """新检索器从缓存目录加载训练结果，不再调用embedding接口"""
+    HierarchicalRetriever(_make_config(cache_dir=str(tmp_path))).fit(DOCUMENTS, CountingEmbedding())
+
+    embedding = CountingEmbedding()
+    retriever = HierarchicalRetriever(_make_config(cache_dir=str(tmp_path)))
+    retriever.fit(DOCUMENTS, embedding)
+
+    assert embedding.calls == 0
+    assert retriever.child_chunks
+    assert retriever.child_embeddings.shape[0] == len(retriever.child_chunks)
+
+
+def test_fit_does_not_cache_failed_embeddings(tmp_path):
+    """部分批次embedding失败时不写缓存、不记录指纹，下次训练重新生成向量"""
+    probe = HierarchicalRetriever(_make_config())
+    _, child_chunks = probe.chunker.split_documents(DOCUMENTS)
+    failing = CountingEmbedding(fail_texts=[child_chunks[0].content])
+
+    retriever = HierarchicalRetriever(_make_config(cache_dir=str(tmp_path)))
+    retriever.fit(DOCUMENTS, failing)
+
+    assert not list(tmp_path.iterdir())
+
+    failing.fail_texts.clear()
+    calls_before_refit = failing.calls
+    retriever.fit(DOCUMENTS, failing)
+
+    assert failing.calls > calls_before_refit
+    assert list(tmp_path.glob("*.npy"))
+
+
+def test_failed_embedding_rows_are_excluded_from_semantic_scores(caplog):
+    """embedding失败的子chunk语义分数为-inf，归一化后为0，且只汇总告警一次"""
+    probe = HierarchicalRetriever(_make_config())
+    _, child_chunks = probe.chunker.split_documents(DOCUMENTS)
+    failing = CountingEmbedding(fail_texts=[child_chunks[0].content])
+
+    retriever = HierarchicalRetriever(_make_config(query_expansion=False, min_score_threshold=0.0))
+    with caplog.at_level("WARNING", logger="hybrid_retrieval"):
+        retriever.fit(DOCUMENTS, failing)
+
+    failure_warnings = [record for record in caplog.records if "embedding生成失败" in record.getMessage()]
+    assert len(failure_warnings) == 1
+    assert f"1/{len(child_chunks)}" in failure_warnings[0].getMessage()
+
+    failing.fail_texts.clear()
+    similarities = retriever._semantic_search_children("机器学习")
+    assert similarities[0] == -np.inf
+    assert np.isfinite(similarities[1:]).all()
+
+    candidates = retriever._search_child_chunks("机器学习", "机器学习")
+    semantic_by_child = dict(zip(candidates["child_index"].tolist(), candidates["semantic_score"].tolist()))
+    assert semantic_by_child.get(0, 0.0) == 0.0
+    assert max(semantic_by_child.values()) == pytest.approx(1.0)
@@ -0,0 +1,138 @@
+"""
+LLM客户端测试
+"""
+
+import asyncio
+import json
+
+import httpx
+
+from llm_client import _iter_sse_payloads
+
+# 模拟服务端逐个token推送的间隔（秒）
+TOKEN_INTERVAL = 0.2
+
+
+def _sse_frame(content: str) -> bytes:
+    """构建一个携带增量内容的SSE数据帧"""
+    payload = {"choices": [{"delta": {"content": content}, "finish_reason": None}]}
+    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+async def _slow_sse_body():
+    """每隔TOKEN_INTERVAL推送一个数据帧的SSE响应体"""
+    for token in ["你", "好", "，", "世", "界"]:
+        yield _sse_frame(token)
+        await asyncio.sleep(TOKEN_INTERVAL)
+    yield b"data: [DONE]\n\n"
+
+
+def test_iter_sse_payloads_streams_before_response_ends():
+    """第一个数据帧应在响应结束前解析出来，而不是等到整个响应读完"""
+
+    async def run():
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, content=_slow_sse_body()))
+        async with httpx.AsyncClient(transport=transport) as client:
+            async with client.stream("POST", "https://example.com/chat/completions") as response:
+                loop = asyncio.get_running_loop()
+                start = loop.time()
+                arrivals = []
+                payloads = []
+                async for batch in _iter_sse_payloads(response):
+                    arrivals.append(loop.time() - start)
+                    payloads.extend(batch)
+                return arrivals, payloads, loop.time() - start
+
+    arrivals, payloads, total = asyncio.run(run())
+
+    assert payloads[-1] == b"[DONE]"
+    assert [json.loads(p)["choices"][0]["delta"]["content"] for p in payloads[:-1]] == ["你", "好", "，", "世", "界"]
+    # 第一个数据帧在第一次推送后立即到达，远早于响应结束
+    assert arrivals[0] < TOKEN_INTERVAL
+    assert total - arrivals[0] >= 3 * TOKEN_INTERVAL
+
+
+def test_iter_sse_payloads_handles_split_frames():
+    """数据帧（包括多字节字符）被拆分到多次网络读取时仍能完整解析"""
+    body = _sse_frame("你好") + _sse_frame("世界") + b"data: [DONE]\n\n"
+
+    async def split_body():
+        for i in range(0, len(body), 5):
+            yield body[i:i + 5]
+
+    async def run():
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, content=split_body()))
+        async with httpx.AsyncClient(transport=transport) as client:
+            async with client.stream("POST", "https://example.com/chat/completions") as response:
+                return [p async for batch in _iter_sse_payloads(response) for p in batch]
+
+    payloads = asyncio.run(run())
+
+    assert payloads[-1] == b"[DONE]"
+    assert [json.loads(p)["choices"][0]["delta"]["content"] for p in payloads[:-1]] == ["你好", "世界"]
+
+
+def test_check_chat_completion_defaults_empty_endpoint(monkeypatch):
+    """未配置接口地址时，验证请求发往提供商的默认OpenAI兼容地址"""
+    import llm_client
+
+    requested_urls = []
+
+    def handler(request):
+        requested_urls.append(str(request.url))
+        return httpx.Response(200, json={"choices": []})
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            monkeypatch.setattr(llm_client, "_get_http_client", lambda: client)
+            return [
+                await llm_client.check_chat_completion("alibaba", "key", "qwen-plus", endpoint)
+                for endpoint in ("", None, "https://example.com/v1/")
+            ]
+
+    assert asyncio.run(run()) == [200, 200, 200]
+    assert requested_urls == [
+        "https://dashscope.aliyuncs.com/compatible-mode/v1/chat/completions",
+        "https://dashscope.aliyuncs.com/compatible-mode/v1/chat/completions",
+        "https://example.com/v1/chat/completions",
+    ]
+
+
+def test_query_many_keeps_job_order_and_reports_errors():
+    """并发问答结果按任务顺序返回；出错任务带error，无检索结果的任务直接返回固定回答"""
+    from llm_client import LLMClient, _NO_RESULTS_ANSWER
+
+    client = LLMClient("alibaba", {"api_key": "key", "model": "qwen-plus"})
+    requested_queries = []
+
+    async def fake_stream_chat(messages, temperature=0.7, max_tokens=2000):
+        user_content = messages[-1]["content"]
+        query = next(q for q in ("慢问题", "快问题", "出错问题") if f"用户问题：{q}" in user_content)
+        requested_queries.append(query)
+        if query == "出错问题":
+            yield {"content": "", "finish_reason": "error", "error": "LLM调用异常"}
+            return
+        # 第一个任务最慢完成，验证结果顺序不依赖完成顺序
+        await asyncio.sleep(0.05 if query == "慢问题" else 0)
+        yield {"content": f"{query}的", "finish_reason": None}
+        yield {"content": "回答", "finish_reason": "stop", "usage": {"total_tokens": 3}}
+
+    client.stream_chat = fake_stream_chat
+    hits = [{"document": "文档内容", "distance": 0.1, "metadata": {}}]
+    jobs = [
+        {"query_results": hits, "user_query": "慢问题"},
+        {"query_results": hits, "user_query": "出错问题"},
+        {"query_results": [], "user_query": "无结果问题"},
+        {"query_results": hits, "user_query": "快问题"},
+    ]
+
+    results = asyncio.run(client.query_many(jobs))
+
+    assert [result["finish_reason"] for result in results] == ["stop", "error", "stop", "stop"]
+    assert results[0]["content"] == "慢问题的回答"
+    assert results[0]["usage"] == {"total_tokens": 3}
+    assert results[1]["error"] == "LLM调用异常"
+    assert results[2]["content"] == _NO_RESULTS_ANSWER
+    assert results[3]["content"] == "快问题的回答"
+    # 无检索结果的任务不发起LLM请求
+    assert sorted(requested_queries) == sorted(["慢问题", "出错问题", "快问题"])